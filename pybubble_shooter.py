@@ -1,12 +1,22 @@
+import argparse
+import heapq
+import itertools
 import math
 import pygame
 import random
 import sys
-from collections import namedtuple
+import time
+from array import array
+from collections import Counter, defaultdict, namedtuple
 from enum import Enum, auto
 from pathlib import Path
 from pygame.locals import (QUIT, K_DOWN, K_RIGHT, K_LEFT, K_UP, K_SPACE,
-    KEYDOWN, MOUSEBUTTONDOWN, Rect)
+    KEYDOWN, MOUSEBUTTONDOWN, MOUSEMOTION, Rect)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 Window = namedtuple('Window', 'width height top bottom left right half_width')
@@ -24,6 +34,16 @@ COLS = 17
 BUBBLE_SIZE = 30
 # screen
 SCREEN = Rect(0, 0, 526, 650)
+FPS = 60
+# layers of sprites
+COURSE_LAYER = 0
+BUBBLE_LAYER = 1
+MOVING_LAYER = 2
+HUD_LAYER = 3
+# simulation
+STEP = 1000 / 60           # milliseconds advanced by one simulation step
+MAX_FRAME_TIME = 250       # milliseconds simulated at most per frame
+STEPS_LIMIT = 60 * 60 * 30  # steps of a headless game, 30 minutes of game time
 # start screen
 SURFACE_LEFT = Point(0, 0)
 GAME_TITLE = Point(40, 200)
@@ -70,6 +90,78 @@ class SoundFiles(Files):
         super().__init__(name, 'sounds')
 
 
+class Assets:
+    """Load image and sound files only once, and share them among sprites.
+    """
+
+    images = {}
+    sounds = {}
+
+    @classmethod
+    def image(cls, file, size=(BUBBLE_SIZE, BUBBLE_SIZE)):
+        if (key := (file, size)) not in cls.images:
+            image = pygame.image.load(file)
+            # images cannot be converted without a window, like in the simulation.
+            if pygame.display.get_surface():
+                image = image.convert_alpha()
+            cls.images[key] = pygame.transform.scale(image, size)
+        return cls.images[key]
+
+    @classmethod
+    def sound(cls, file):
+        if file not in cls.sounds:
+            cls.sounds[file] = pygame.mixer.Sound(file)
+        return cls.sounds[file]
+
+    @classmethod
+    def clear(cls):
+        cls.images.clear()
+        cls.sounds.clear()
+
+
+class SoundManager:
+    """Play sounds only on the channels reserved for each of them. A sound triggered
+       many times in a step is played only once at the end of the step, and when all of
+       its channels are busy, the one that started playing the longest ago is reused,
+       so that the sounds played at the same time are bounded.
+    """
+
+    def __init__(self, limits=None):
+        # the number of channels reserved for each sound.
+        self.limits = limits or {SoundFiles.SOUND_POP: 3, SoundFiles.FANFARE: 1}
+        self.channels = None
+        self.requests = []
+
+    def play(self, sound):
+        """Request to play a sound at the end of the current step.
+           Args:
+             sound (SoundFiles): sound to play
+        """
+        if sound not in self.requests:
+            self.requests.append(sound)
+
+    def reserve(self):
+        pygame.mixer.set_reserved(sum(self.limits.values()))
+        ids = itertools.count()
+        self.channels = {sound: [pygame.mixer.Channel(next(ids)) for _ in range(limit)]
+                         for sound, limit in self.limits.items()}
+
+    def update(self):
+        """Play the sounds requested in the step.
+        """
+        if self.requests and pygame.mixer.get_init():
+            if self.channels is None:
+                self.reserve()
+            for sound in self.requests:
+                channels = self.channels[sound]
+                channel = next((ch for ch in channels if not ch.get_busy()), channels[0])
+                # the channel played last goes to the end.
+                channels.remove(channel)
+                channels.append(channel)
+                channel.play(Assets.sound(sound.path))
+        self.requests.clear()
+
+
 class Colors(Enum):
 
     YELLOW_GREEN = ('yellow_green', (153, 255, 102))
@@ -114,72 +206,323 @@ class Status(Enum):
     START = auto()
 
 
-def round_up(value):
-    return int(math.copysign(math.ceil(abs(value)), value))
-
-
 def round(value):
     return int((value * 2 + 1) // 2)
 
 
+class Geometry:
+    """Centers and sides of all the cells, stored in flat arrays indexed by row * cols + col.
+    """
+
+    def __init__(self, rows=ROWS, cols=COLS):
+        self.rows = rows
+        self.cols = cols
+        self.center_x = array('i', [0] * rows * cols)
+        self.center_y = array('i', [0] * rows * cols)
+        self.calculate_centers()
+        half = BUBBLE_SIZE // 2
+        self.left = array('i', (x - half for x in self.center_x))
+        self.right = array('i', (x + half for x in self.center_x))
+        self.top = array('i', (y - half for y in self.center_y))
+        self.bottom = array('i', (y + half for y in self.center_y))
+        self.edges = self.create_edges() if np else None
+
+    def calculate_centers(self):
+        for row in range(self.rows):
+            if row % 2 == 0:
+                start = X_START_POS
+            else:
+                start = X_START_POS + BUBBLE_SIZE // 2
+            for col in range(self.cols):
+                idx = row * self.cols + col
+                self.center_x[idx] = start + BUBBLE_SIZE * col
+                self.center_y[idx] = Y_START_POS + BUBBLE_SIZE * row
+
+    def create_edges(self):
+        """Return the x and y of the start and end points of the bottom, right, left
+           and top sides of all the cells as NumPy arrays shaped (4, rows * cols).
+        """
+        left, right, top, bottom = (np.array(arr, dtype=np.int64)
+                                    for arr in (self.left, self.right, self.top, self.bottom))
+        x3 = np.stack([left, right, left, left])
+        y3 = np.stack([bottom, top, top, top])
+        x4 = np.stack([right, right, left, right])
+        y4 = np.stack([bottom, bottom, bottom, top])
+        return x3, y3, x4, y4
+
+    def crossing(self, pt1, pt2):
+        """Test line segment pt1pt2 against the four sides of all the cells at once
+           in the same way as Shooter._is_crossing, and return a boolean array telling
+           whether each cell is crossed. NumPy is required.
+           Args:
+             pt1 (Point): one end of a line segment
+             pt2 (Point): the another end of a line segment
+        """
+        x3, y3, x4, y4 = self.edges
+        dx, dy = pt1.x - pt2.x, pt1.y - pt2.y
+        tc1 = dx * (y3 - pt1.y) + dy * (pt1.x - x3)
+        tc2 = dx * (y4 - pt1.y) + dy * (pt1.x - x4)
+        td1 = (x3 - x4) * (pt1.y - y3) + (y3 - y4) * (x3 - pt1.x)
+        td2 = (x3 - x4) * (pt2.y - y3) + (y3 - y4) * (x3 - pt2.x)
+        return ((tc1 * tc2 < 0) & (td1 * td2 < 0)).any(axis=0)
+
+
 class Cell:
+    """A view of the geometry of a cell, which can hold a bubble.
+    """
 
-    __slots__ = ['bubble', 'row', 'col', 'center',
-                 'left', 'right', 'top', 'bottom']
+    __slots__ = ['_bubble', 'observer', 'row', 'col', 'idx', 'neighbors']
 
-    def __init__(self, row, col):
-        self.bubble = None
+    geometry = Geometry()
+
+    def __init__(self, row, col, observer=None):
+        self._bubble = None
+        self.observer = observer
         self.row = row
         self.col = col
-        self.calculate_center()
-        self.calculate_sides()
+        self.idx = row * self.geometry.cols + col
+        self.neighbors = ()
 
-    def calculate_sides(self):
-        half = BUBBLE_SIZE // 2
-        left_top = Point(self.center.x - half, self.center.y - half)
-        right_bottom = Point(self.center.x + half, self.center.y + half)
-        right_top = Point(self.center.x + half, self.center.y - half)
-        left_bottom = Point(self.center.x - half, self.center.y + half)
-
-        self.left = Line(left_top, left_bottom)
-        self.right = Line(right_top, right_bottom)
-        self.top = Line(left_top, right_top)
-        self.bottom = Line(left_bottom, right_bottom)
-
-    def calculate_center(self):
-        if self.row % 2 == 0:
-            start = X_START_POS
-        else:
-            start = X_START_POS + BUBBLE_SIZE // 2
-        x = start + BUBBLE_SIZE * self.col
-        y = Y_START_POS + BUBBLE_SIZE * self.row
-        self.center = Point(x, y)
+    @property
+    def bubble(self):
+        return self._bubble
+
+    @bubble.setter
+    def bubble(self, bubble):
+        """Set a bubble, and notify the observer, if any, that the board is changed.
+        """
+        old, self._bubble = self._bubble, bubble
+        if self.observer and old is not bubble:
+            self.observer.bubble_changed(self, old, bubble)
+
+    @bubble.deleter
+    def bubble(self):
+        self.bubble = None
+
+    @property
+    def center(self):
+        return Point(self.geometry.center_x[self.idx], self.geometry.center_y[self.idx])
+
+    @property
+    def rect(self):
+        g = self.geometry
+        return Rect(g.left[self.idx], g.top[self.idx],
+                    g.right[self.idx] - g.left[self.idx], g.bottom[self.idx] - g.top[self.idx])
+
+    def corner(self, xs, ys):
+        return Point(xs[self.idx], ys[self.idx])
+
+    @property
+    def left(self):
+        g = self.geometry
+        return Line(self.corner(g.left, g.top), self.corner(g.left, g.bottom))
+
+    @property
+    def right(self):
+        g = self.geometry
+        return Line(self.corner(g.right, g.top), self.corner(g.right, g.bottom))
+
+    @property
+    def top(self):
+        g = self.geometry
+        return Line(self.corner(g.left, g.top), self.corner(g.right, g.top))
+
+    @property
+    def bottom(self):
+        g = self.geometry
+        return Line(self.corner(g.left, g.bottom), self.corner(g.right, g.bottom))
 
     def move_bubble(self, move_to):
         if not move_to.bubble:
-            self.bubble.rect.centerx = move_to.center.x
-            self.bubble.rect.centery = move_to.center.y
-            move_to.bubble = self.bubble
+            bubble = self.bubble
+            bubble.rect.centerx = move_to.center.x
+            bubble.rect.centery = move_to.center.y
             self.bubble = None
+            move_to.bubble = bubble
 
     def delete_bubble(self):
         if self.bubble:
-            self.bubble = self.bubble.kill()
+            self.bubble = self.bubble.release()
+
+
+class BitBoard:
+    """Board on which the cells having bubbles are represented by the bits of integers.
+       The bit at row * cols + col is for the cell at (row, col). Even rows are placed
+       half a bubble left of odd rows, as in the Cell.
+    """
+
+    def __init__(self, rows=ROWS, cols=COLS):
+        self.rows = rows
+        self.cols = cols
+        self.full = (1 << rows * cols) - 1
+        self.top = (1 << cols) - 1
+        self.left_edge = sum(1 << row * cols for row in range(rows))
+        self.right_edge = self.left_edge << cols - 1
+        self.even_rows = sum(self.top << row * cols for row in range(0, rows, 2))
+        self.odd_rows = self.full & ~self.even_rows
+        self.occupied = 0
+        self.removed = 0
+        self.colors = defaultdict(int)
+
+    def bit(self, row, col):
+        return 1 << row * self.cols + col
+
+    def put(self, row, col, color):
+        bit = self.bit(row, col)
+        self.occupied |= bit
+        self.colors[color] |= bit
+
+    def remove(self, row, col, color):
+        bit = self.bit(row, col)
+        self.occupied &= ~bit
+        self.removed |= bit
+        self.colors[color] &= ~bit
+
+    def expand(self, bits):
+        """Return bits to which the bits of all their neighbors are added.
+        """
+        vertical = bits << self.cols | bits >> self.cols
+        even = bits & self.even_rows
+        odd = bits & self.odd_rows
+        # diagonal neighbors are at col - 1 for even rows, and at col + 1 for odd rows.
+        to_left = bits | even << self.cols | even >> self.cols
+        to_right = bits | odd << self.cols | odd >> self.cols
+        expanded = bits | vertical | to_left >> 1 & ~self.right_edge | to_right << 1 & ~self.left_edge
+        return expanded & self.full
+
+    def flood(self, seed, mask):
+        """Return bits in the mask connected to the seed.
+        """
+        filled = seed & mask
+        while (grown := self.expand(filled) & mask) != filled:
+            filled = grown
+        return filled
+
+    def floating(self):
+        """Return bits of the bubbles that have lost connection to the top by
+           the removals since the last call. Only clusters next to the removed bubbles
+           are grown, and a cluster stops growing as soon as it reaches the top.
+        """
+        seeds = self.expand(self.removed) & self.occupied
+        self.removed = 0
+        floating = 0
+
+        while seeds:
+            cluster = seeds & -seeds
+            while not cluster & self.top:
+                if (grown := self.expand(cluster) & self.occupied) == cluster:
+                    floating |= cluster
+                    break
+                cluster = grown
+            seeds &= ~cluster
+
+        return floating
+
+    def positions(self, bits):
+        while bits:
+            low = bits & -bits
+            yield divmod(low.bit_length() - 1, self.cols)
+            bits ^= low
+
+
+class FlightPath:
+    """Points through which a bullet passes, stored in a flat array of x and y.
+       Args:
+         lines (list): Lines on which a bullet moves
+         step (int): distance between the points on a line
+    """
+
+    def __init__(self, lines, step=10):
+        self.coords = array('d')
+        for line in lines:
+            self.add(line.start, line.end, step)
+
+    def add(self, start, end, step):
+        """Add the points every step from start, followed by end.
+        """
+        dx = end.x - start.x
+        dy = end.y - start.y
+        distance = (dx ** 2 + dy ** 2) ** 0.5
+        vx = dx * step / distance if distance else 0
+        vy = dy * step / distance if distance else 0
+
+        for i in range(1, math.ceil(distance / step)):
+            self.coords.append(start.x + vx * i)
+            self.coords.append(start.y + vy * i)
+        self.coords.append(end.x)
+        self.coords.append(end.y)
+
+    def __len__(self):
+        return len(self.coords) // 2
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('FlightPath index out of range')
+        return Point(self.coords[idx * 2], self.coords[idx * 2 + 1])
+
+
+class Scheduler:
+    """Callbacks called after a delay in game time. The game time is advanced
+       by the main loop, so waiting for a callback never blocks the loop.
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.queue = []
+        self.counter = itertools.count()
+
+    def call_later(self, delay, callback, *args):
+        """Call callback with args when the game time has been advanced by delay.
+           Args:
+             delay (float): milliseconds
+        """
+        # the counter keeps callbacks due at the same time in order of scheduling.
+        heapq.heappush(self.queue, (self.now + delay, next(self.counter), callback, args))
+
+    def call_every(self, interval, callback, *args):
+        """Call callback with args every time the game time has been advanced by interval.
+           Args:
+             interval (float): milliseconds
+        """
+        def repeat(due):
+            callback(*args)
+            # scheduled from the due time, so that the delays of steps do not accumulate.
+            self.call_later(due + interval - self.now, repeat, due + interval)
+        self.call_later(interval, repeat, self.now + interval)
+
+    def advance(self, elapsed):
+        """Advance the game time by elapsed milliseconds, and call the callbacks due by then.
+        """
+        self.now += elapsed
+        while self.queue and self.queue[0][0] <= self.now:
+            _, _, callback, args = heapq.heappop(self.queue)
+            callback(*args)
 
 
 class Shooter:
 
-    def __init__(self, screen, score, droppings):
-        self.droppings_group = droppings
+    def __init__(self, screen, score, scheduler=None, sounds=None):
         self.screen = screen
         self.score = score
-        self.sysfont = pygame.font.SysFont(None, 30)
-        self.cells = [[Cell(row, col) for col in range(COLS)] for row in range(ROWS)]
+        self.scheduler = scheduler or Scheduler()
+        self.sounds = sounds or SoundManager()
+        self.revision = 0
+        self.courses = {}
+        self.total = 0
+        self.row_counts = [0] * ROWS
+        self.color_counts = Counter()
+        self.bitboard = BitBoard()
+        # cells whose bubbles have to be drawn again on the board.
+        self.stale = set()
+        self.create_cells()
+        self.course = []
         self.dest = None
         self.target = None
         self.bullet = None
         self.create_launcher()
-        self.create_sound()
+        self.droppings = Dropping(self)
         self.initialize_game()
         self.game = Status.START
 
@@ -190,23 +533,43 @@ class Shooter:
         self.is_decrease = False
         self.next_bullet = None
         self.launcher_angle = 90
+        self.is_quitting = False
         self.create_bubbles(10)
         self.charge()
         self.status = Status.READY
 
     def create_launcher(self):
         self.launcher = Point(WINDOW.half_width, WINDOW.height)
-        self.radius = self.get_radius(WINDOW.half_width, WINDOW.height)
-        self.limit_angle = round_up(
-            self.calculate_angle(WINDOW.height, WINDOW.half_width))
         self.bullet_holder = Point(WINDOW.half_width, 635)
+        self.background = None
+        self.board = None
+        # bounce points for every launcher angle move_left and move_right can set.
+        self.bounces = {angle: self.reflect(angle) for angle in range(5, 176)}
         self.create_rects()
 
+    def create_cells(self):
+        self.cells = [[Cell(row, col, self) for col in range(COLS)] for row in range(ROWS)]
+        for cells in self.cells:
+            for cell in cells:
+                cell.neighbors = tuple(
+                    self.cells[row][col] for row, col in self.find_neighbors(cell.row, cell.col))
+
+    def find_neighbors(self, row, col):
+        """Return (row, col) of the cells around a cell, from the lower row to the upper.
+        """
+        if row % 2 == 0:
+            candidates = [(row + 1, col - 1), (row + 1, col), (row, col - 1),
+                          (row, col + 1), (row - 1, col - 1), (row - 1, col)]
+        else:
+            candidates = [(row + 1, col + 1), (row + 1, col), (row, col + 1),
+                          (row, col - 1), (row - 1, col + 1), (row - 1, col)]
+        return [(r, c) for r, c in candidates if 0 <= r < ROWS and 0 <= c < COLS]
+
     def create_bubbles(self, rows=15):
         for row in range(rows):
             for cell in self.cells[row]:
                 kit = self.get_bubble()
-                bubble = Bubble(kit.file.path, kit.color, cell.center, self)
+                bubble = Bubble.acquire(kit.file.path, kit.color, cell.center, self)
                 cell.bubble = bubble
 
     def create_rects(self):
@@ -216,86 +579,6 @@ class Shooter:
                 # 105, 210, 315, 420, 525
                 self.bars.append(Rect(105 * i, 540, 5, 55))
 
-    def create_sound(self):
-        self.fanfare = pygame.mixer.Sound(SoundFiles.FANFARE.path)
-
-    def simulate_shoot_right(self, start, end):
-        """Yield lines on which a bullet shot to the right first will move.
-           Args:
-             start (Point): at where a bullet is shot
-             end (Point): where a bullet will collid first with the screen right wall.
-        """
-        is_stop, line = self._simulate_course(start, end)
-
-        if line:
-            yield line
-        if not is_stop:
-            angle = 90 - self.launcher_angle
-            for line in self._simulate_bounce_course(angle, end, is_stop, True):
-                yield line
-
-    def simulate_shoot_left(self, start, end):
-        """Yield lines on which a bullet shot to the left first will move.
-           Args:
-             start (Point): at where a bullet is shot
-             end (Point): where a bullet will collid first with the screen right wall.
-        """
-        is_stop, line = self._simulate_course(start, end)
-
-        if line:
-            yield line
-        if not is_stop:
-            angle = self.launcher_angle - 90
-            for line in self._simulate_bounce_course(angle, end, is_stop, False):
-                yield line
-
-    def simulate_shoot_top(self, start, end):
-        """Yield a line on which a bullet shot to the top will move.
-           Args:
-             start (Point): at where a bullet is shot
-             end (Point): where a bullet will collid with the top of the screen.
-        """
-        _, line = self._simulate_course(start, end, True)
-
-        if line:
-            yield line
-
-    def _simulate_bounce_course(self, angle, start, is_stop, to_left):
-        """Simulate the bullet moving with repeated bounce to the screen walls.
-           Args:
-             angle (int): reflection angle
-             start (Point): where a bullet will collid with the screen walls
-             is_stop (bool): True any more lines are not to be drawn.
-             to_left (bool): True if bounce from right to left, False if left to right.
-        """
-        if not is_stop and to_left:
-            if (x := WINDOW.width - self.calculate_height(angle, start.y)) >= 0:
-                is_stop, line = self._simulate_course(start, Point(x, 0), True)
-                if line:
-                    yield line
-            else:
-                bottom = self.calculate_bottom(angle, WINDOW.width)
-                left_pt = Point(0, start.y - bottom)
-                is_stop, line = self._simulate_course(start, left_pt)
-                if line:
-                    yield line
-                if not is_stop:
-                    yield from self._simulate_bounce_course(angle, left_pt, is_stop, False)
-
-        if not is_stop and not to_left:
-            if (x := self.calculate_height(angle, start.y)) <= WINDOW.width:
-                is_stop, line = self._simulate_course(start, Point(x, 0), True)
-                if line:
-                    yield line
-            else:
-                bottom = self.calculate_bottom(angle, WINDOW.width)
-                right_pt = Point(WINDOW.width, start.y - bottom)
-                is_stop, line = self._simulate_course(start, right_pt)
-                if line:
-                    yield line
-                if not is_stop:
-                    yield from self._simulate_bounce_course(angle, right_pt, is_stop, True)
-
     def _simulate_course(self, start, end, no_bounce=False):
         """Simulate the movement of a bullet.
            Args:
@@ -315,38 +598,84 @@ class Shooter:
             return False, Line(start, end)
         return True, None
 
-    def set_timer(self, seconds):
-        last = pygame.time.get_ticks()
-        while True:
-            now = pygame.time.get_ticks()
-            if now - last >= seconds:
-                break
-
     def quit_game(self):
-        if len(self.droppings_group.sprites()) == 0:
+        if len(self.droppings) == 0 and not self.is_quitting:
+            self.is_quitting = True
             if self.status == Status.WIN:
-                self.set_timer(1000)
-                self.fanfare.play()
-            self.game = self.status
+                self.scheduler.call_later(1000, self.end_game)
+            else:
+                self.end_game()
+
+    def end_game(self):
+        if self.status == Status.WIN:
+            self.sounds.play(SoundFiles.FANFARE)
+        self.game = self.status
 
-    def draw_setting(self):
+    def create_background(self):
+        """Return a surface on which the parts of the screen never changed
+           during play are drawn: the field, the panel, the bars with their labels
+           and the launcher.
+        """
+        background = pygame.Surface(SCREEN.size)
+        background.fill(Colors.GREEN.color_code)
         pygame.draw.rect(
-            self.screen, Colors.DARK_GREEN.color_code, (0, 600, WINDOW.width, 50))
+            background, Colors.DARK_GREEN.color_code, (0, 600, WINDOW.width, 50))
         pygame.draw.circle(
-            self.screen, Colors.DARK_GREEN.color_code, self.launcher, 20)
-        pygame.draw.circle(self.screen, self.next_bullet.color_code, self.bullet_holder, 4)
+            background, Colors.DARK_GREEN.color_code, self.launcher, 20)
 
         for bar in self.bars:
-            pygame.draw.rect(self.screen, Colors.DARK_GREEN.color_code, bar)
+            pygame.draw.rect(background, Colors.DARK_GREEN.color_code, bar)
 
+        sysfont = pygame.font.SysFont(None, 30)
         for num, place in zip(['50', '100', '250', '100', '50'], [49, 140, 250, 350, 460]):
-            text = self.sysfont.render(num, True, Colors.RIGHT_GRAY.color_code)
-            self.screen.blit(text, (place, 540))
+            text = sysfont.render(num, True, Colors.RIGHT_GRAY.color_code)
+            background.blit(text, (place, 540))
+        return background
+
+    def get_background(self):
+        """Return the background, creating it at the first time, or after it is
+           discarded because the layout is changed.
+        """
+        if self.background is None:
+            self.background = self.create_background()
+        return self.background
+
+    def draw_bubbles(self, surface):
+        """Draw the bubbles resting in the cells on the surface.
+        """
+        for cells in self.cells:
+            for cell in cells:
+                if cell.bubble:
+                    surface.blit(cell.bubble.image, cell.rect)
+
+    def get_board(self):
+        """Return the board: the background on which the bubbles resting in the cells
+           are drawn. After that, only the changed cells are drawn again by refresh_board.
+        """
+        if self.board is None:
+            self.board = self.get_background().copy()
+            self.draw_bubbles(self.board)
+            self.stale.clear()
+        return self.board
+
+    def refresh_board(self):
+        """Draw the cells changed since the last call again on the board.
+           Returns:
+             list: rects of the cells drawn again
+        """
+        board = self.get_board()
+        rects = []
+        for cell in self.stale:
+            rect = cell.rect
+            board.blit(self.background, rect, rect)
+            if cell.bubble:
+                board.blit(cell.bubble.image, rect)
+            rects.append(rect)
+        self.stale.clear()
+        return rects
 
     def update(self):
         if self.game == Status.PLAY:
-            self.draw_setting()
-
             if self.status == Status.READY:
                 if not (count := self.count_bubbles()):
                     self.status = Status.WIN
@@ -359,48 +688,119 @@ class Shooter:
                             self.increase_bubbles(4)
                             self.is_increase = False
 
-                if any(cell.bubble for cell in self.cells[-1]):
+                if self.count_row(ROWS - 1):
                     self.status = Status.GAMEOVER
 
             if self.status in {Status.WIN, Status.GAMEOVER}:
                 self.quit_game()
 
-            if 0 < self.launcher_angle <= self.limit_angle:
-                y = WINDOW.height - self.calculate_height(self.launcher_angle, WINDOW.half_width)
-                pt = Point(WINDOW.width, y)
-                self.course = [line for line in self.simulate_shoot_right(self.launcher, pt)]
-            elif self.launcher_angle >= 180 - self.limit_angle:
-                y = WINDOW.height - self.calculate_height(180 - self.launcher_angle, WINDOW.half_width)
-                pt = Point(0, y)
-                self.course = [line for line in self.simulate_shoot_left(self.launcher, pt)]
-            else:
-                if self.limit_angle < self.launcher_angle <= 90:
-                    x = WINDOW.half_width + self.calculate_height(90 - self.launcher_angle, WINDOW.height)
-                elif 90 < self.launcher_angle < 180 - self.limit_angle:
-                    x = WINDOW.half_width - self.calculate_height(self.launcher_angle - 90, WINDOW.height)
-                self.course = [line for line in self.simulate_shoot_top(self.launcher, Point(x, 0))]
-
-            if self.dest:
-                for line in self.course:
-                    pygame.draw.line(self.screen, Colors.DARK_GREEN.color_code, line.start, line.end, 2)
+            # the course is kept while a bullet is flying to the destination.
+            if self.status != Status.SHOT:
+                self.aim()
 
             if self.status == Status.CHARGE:
                 self.charge()
                 self.status = Status.READY
 
+    def bubble_changed(self, cell, old, new):
+        """Called by Cell whenever a bubble is put into or removed from it.
+        """
+        self.revision += 1
+        self.stale.add(cell)
+        # bubbles resting in the cells are drawn on the board instead of as sprites.
+        if old:
+            old.visible = 1
+            self.total -= 1
+            self.row_counts[cell.row] -= 1
+            self.color_counts[old.color] -= 1
+            self.bitboard.remove(cell.row, cell.col, old.color)
+        if new:
+            new.visible = 0
+            self.total += 1
+            self.row_counts[cell.row] += 1
+            self.color_counts[new.color] += 1
+            self.bitboard.put(cell.row, cell.col, new.color)
+
+    def aim(self):
+        """Set the course, dest and target for the current launcher angle.
+           The simulation is done only if the launcher angle or the board has been
+           changed since the last simulation.
+        """
+        key = (self.launcher_angle, self.revision)
+
+        if key not in self.courses:
+            # courses simulated on the board before changed are no longer used.
+            if self.courses and next(iter(self.courses))[1] != self.revision:
+                self.courses.clear()
+            self.course = self.simulate_shoot()
+            self.courses[key] = (self.course, self.dest, self.target)
+
+        self.course, self.dest, self.target = self.courses[key]
+
+    def simulate_shoot(self):
+        """Return lines on which a bullet shot at the current launcher angle will move.
+           The lines between the walls entirely below the lowest bubbles are not traced,
+           because the bullet cannot collide with any bubble there.
+        """
+        if not (points := self.bounces.get(self.launcher_angle)):
+            points = self.reflect(self.launcher_angle)
+        rows = [row for row, count in enumerate(self.row_counts) if count]
+        floor = self.cells[rows[-1]][0].bottom.start.y if rows else 0
+        course = []
+
+        for i, (start, end) in enumerate(zip(points, points[1:]), 2):
+            if (no_bounce := i == len(points)) or min(start.y, end.y) < floor:
+                is_stop, line = self._simulate_course(start, end, no_bounce)
+            else:
+                is_stop, line = False, Line(start, end)
+            if line:
+                course.append(line)
+            if is_stop:
+                break
+        return course
+
+    def reflect(self, angle):
+        """Return the points at which a bullet shot at the angle bounces off the side walls,
+           following the launcher and followed by the point at which the bullet reaches
+           the top of the screen. The screen is unfolded across the side walls so that
+           all of the points are on the same straight line.
+           Args:
+             angle (float): launcher angle in degrees
+        """
+        width = WINDOW.width
+        rad = math.radians(angle)
+        slope = math.sin(rad) / math.cos(rad) if angle != 90 else None
+        # x of the point reaching the top in the unfolded screen
+        top_x = self.launcher.x + (self.launcher.y / slope if slope else 0)
+
+        if top_x > width:
+            walls = range(width, math.ceil(top_x), width)
+        elif top_x < 0:
+            walls = range(0, math.floor(top_x), -width)
+        else:
+            walls = range(0)
+
+        points = [self.launcher]
+        for wall in walls:
+            y = self.launcher.y - (wall - self.launcher.x) * slope
+            points.append(Point(0 if wall // width % 2 == 0 else width, round(y)))
+        x = top_x % (width * 2)
+        points.append(Point(round(x if x <= width else width * 2 - x), 0))
+        return points
+
     def get_bubble(self):
         return random.choice(self.bubbles)
 
     def charge(self):
         if not self.next_bullet:
             if self.bullet:
-                self.bullet = self.bullet.kill()
+                self.bullet = self.bullet.release()
             bullet = self.get_bubble()
         else:
             bullet = self.next_bullet
 
         self.next_bullet = self.get_bubble()
-        self.bullet = Bullet(
+        self.bullet = Bullet.acquire(
             bullet.file.path, bullet.color, self)
 
     def _find_cross_point(self, pt1, pt2, pt3, pt4):
@@ -448,23 +848,74 @@ class Shooter:
         """
         target = None
         step = 1 if start.x >= end.x else -1
-        for cells in self.cells[::-1]:
+        for cells in self._cross(start, end):
             empty = None
             for cell in cells[::step]:
-                if self.is_crossing(start, end, cell):
-                    if not cell.bubble and not empty:
-                        empty = cell
-                    if cell.bubble:
-                        target = cell
-                        break
+                if not cell.bubble and not empty:
+                    empty = cell
+                if cell.bubble:
+                    target = cell
+                    break
             if not target and empty:
                 yield empty
             elif target:
                 yield target
                 break
 
+    def _cross(self, start, end):
+        """Yield the Cells intersecting a simulation line row by row from bottom
+           to top, each row in order of columns. All the cells are tested in one call
+           if NumPy is available, otherwise only the ones picked up by _walk are tested.
+           Args:
+             start (Point): one end of a simulation line
+             end (Point): the another end of a simulation line
+        """
+        if np is None:
+            for cells in self._walk(start, end):
+                if crossed := [cell for cell in cells if self.is_crossing(start, end, cell)]:
+                    yield crossed
+            return
+
+        cols = Cell.geometry.cols
+        crossed = defaultdict(list)
+        for idx in np.flatnonzero(Cell.geometry.crossing(start, end)).tolist():
+            crossed[idx // cols].append(idx % cols)
+        for row in sorted(crossed, reverse=True):
+            cells = self.cells[row]
+            yield [cells[col] for col in crossed[row]]
+
+    def _walk(self, start, end):
+        """Walk the rows from bottom to top, and yield Cells in each row that
+           a simulation line can pass through. Cells are narrowed down to ones
+           overlapping the part of the line within the row, with a margin of one cell.
+           Args:
+             start (Point): one end of a simulation line
+             end (Point): the another end of a simulation line
+        """
+        half = BUBBLE_SIZE // 2
+        top = self.cells[0][0].center.y - half
+        dx = end.x - start.x
+        dy = end.y - start.y
+        y_min, y_max = min(start.y, end.y), max(start.y, end.y)
+        bottom_row = min(int((y_max - top) // BUBBLE_SIZE) + 1, len(self.cells) - 1)
+        top_row = max(int((y_min - top) // BUBBLE_SIZE) - 1, 0)
+
+        for row in range(bottom_row, top_row - 1, -1):
+            cells = self.cells[row]
+            y0 = max(top + BUBBLE_SIZE * row, y_min)
+            y1 = min(top + BUBBLE_SIZE * (row + 1), y_max)
+            if dy:
+                x0 = start.x + dx * (y0 - start.y) / dy
+                x1 = start.x + dx * (y1 - start.y) / dy
+            else:
+                x0, x1 = start.x, end.x
+            left = cells[0].center.x - half
+            first = max(int((min(x0, x1) - left) // BUBBLE_SIZE) - 1, 0)
+            last = min(int((max(x0, x1) - left) // BUBBLE_SIZE) + 1, len(cells) - 1)
+            yield cells[first:last + 1]
+
     def _scan(self, target):
-        for cell in self.scan_bubbles(target.row, target.col):
+        for cell in target.neighbors:
             if not cell.bubble:
                 yield cell
 
@@ -503,62 +954,25 @@ class Shooter:
                 return traced[-1], None
             else:
                 dest, target = traced[-2:]
-                if not any(cell.bubble for cell in self.scan_bubbles(dest.row, dest.col) if cell.bubble):
+                if not any(cell.bubble for cell in dest.neighbors):
                     dest = self._find_destination(target, dest)
                 return dest, target
         return None, None
 
-    def scan_bubbles(self, row, col):
-        if row == 0:
-            if row + 1 < ROWS and col - 1 >= 0:
-                yield self.cells[row + 1][col - 1]
-            if row + 1 < ROWS:
-                yield self.cells[row + 1][col]
-            if col - 1 >= 0:
-                yield self.cells[row][col - 1]
-            if col + 1 < COLS:
-                yield self.cells[row][col + 1]
-        elif row % 2 == 0:
-            if row + 1 < ROWS and col - 1 >= 0:
-                yield self.cells[row + 1][col - 1]
-            if row + 1 < ROWS:
-                yield self.cells[row + 1][col]
-            if col - 1 >= 0:
-                yield self.cells[row][col - 1]
-            if col + 1 < COLS:
-                yield self.cells[row][col + 1]
-            if row - 1 >= 0 and col - 1 >= 0:
-                yield self.cells[row - 1][col - 1]
-            if row - 1 >= 0:
-                yield self.cells[row - 1][col]
-        else:
-            if row + 1 < ROWS and col + 1 < COLS:
-                yield self.cells[row + 1][col + 1]
-            if row + 1 < ROWS:
-                yield self.cells[row + 1][col]
-            if col + 1 < COLS:
-                yield self.cells[row][col + 1]
-            if col - 1 >= 0:
-                yield self.cells[row][col - 1]
-            if row - 1 >= 0 and col + 1 < COLS:
-                yield self.cells[row - 1][col + 1]
-            if row - 1 >= 0:
-                yield self.cells[row - 1][col]
-
     def calculate_distance(self, pt1, pt2):
         return ((pt2.x - pt1.x) ** 2 + (pt2.y - pt1.y) ** 2) ** 0.5
 
-    def get_radius(self, bottom, height):
-        return (bottom ** 2 + height ** 2) ** 0.5
-
     def calculate_angle(self, height, bottom):
         return math.degrees(math.atan2(height, bottom))
 
-    def calculate_height(self, angle, bottom):
-        return round_up(math.tan(math.radians(angle)) * bottom)
-
-    def calculate_bottom(self, angle, height):
-        return round_up(height / math.tan(math.radians(angle)))
+    def aim_at(self, x, y):
+        """Turn the launcher toward a point in steps of 0.1 degrees.
+           Args:
+             x (int): x of the point, like the mouse cursor position
+             y (int): y of the point
+        """
+        angle = self.calculate_angle(max(self.launcher.y - y, 1), x - self.launcher.x)
+        self.launcher_angle = min(max(round(angle * 10) / 10, 5), 175)
 
     def move_right(self):
         self.launcher_angle -= 2
@@ -608,17 +1022,24 @@ class Shooter:
         else:
             self.increase_bubbles(10)
 
+    def find_cells(self, bits):
+        """Return Cells corresponding to the bits of the bitboard.
+        """
+        return [self.cells[row][col] for row, col in self.bitboard.positions(bits)]
+
     def count_bubbles(self):
-        total = sum(
-            sum(True if cell.bubble else False for cell in cells) for cells in self.cells)
-        return total
+        return self.total
+
+    def count_row(self, row):
+        return self.row_counts[row]
+
+    def count_color(self, color):
+        return self.color_counts[color]
 
 
 class Score:
 
-    def __init__(self, screen):
-        self.sysfont = pygame.font.SysFont(None, 30)
-        self.screen = screen
+    def __init__(self):
         self.score = 0
 
     def add(self, x):
@@ -633,145 +1054,202 @@ class Score:
         elif x > 425:
             self.score += 50
 
+
+class ScoreBoard(pygame.sprite.DirtySprite):
+    """The score displayed on the panel.
+    """
+
+    _layer = HUD_LAYER
+
+    def __init__(self, score):
+        super().__init__(self.containers)
+        self.sysfont = pygame.font.SysFont(None, 30)
+        self.score = score
+        self.rendered = None
+        self.update()
+
     def update(self):
-        text = self.sysfont.render(str(self.score), True, Colors.RIGHT_GRAY.color_code)
-        self.screen.blit(text, (10, 615))
+        # render the score again only if it has been changed.
+        if self.rendered != self.score.score:
+            self.rendered = self.score.score
+            self.image = self.sysfont.render(str(self.rendered), True, Colors.RIGHT_GRAY.color_code)
+            self.rect = self.image.get_rect(topleft=(10, 615))
+            self.dirty = 1
 
 
-class BaseBubble(pygame.sprite.Sprite):
+class NextBullet(pygame.sprite.DirtySprite):
+    """A dot on the panel in the color of the next bullet.
+    """
 
-    def __init__(self, file, color, center, shooter):
+    _layer = HUD_LAYER
+
+    def __init__(self, shooter):
         super().__init__(self.containers)
-        self.image = pygame.image.load(file).convert_alpha()
-        self.image = pygame.transform.scale(self.image, (BUBBLE_SIZE, BUBBLE_SIZE))
-        self.rect = self.image.get_rect()
-        self.rect.centerx = center.x
-        self.rect.centery = center.y
-        self.speed_x = 0
-        self.speed_y = 0
-        self.color = color
-        self.status = Status.STAY
         self.shooter = shooter
-        self.create_sound()
+        self.image = pygame.Surface((8, 8), flags=pygame.SRCALPHA)
+        self.rect = self.image.get_rect(center=shooter.bullet_holder)
+        self.color_code = None
+        self.update()
 
-    def create_sound(self):
-        self.sound_pop = pygame.mixer.Sound(SoundFiles.SOUND_POP.path)
+    def update(self):
+        if (bullet := self.shooter.next_bullet) and bullet.color_code != self.color_code:
+            self.color_code = bullet.color_code
+            self.image.fill((0, 0, 0, 0))
+            pygame.draw.circle(self.image, self.color_code, (4, 4), 4)
+            self.dirty = 1
+
+
+class AimLine(pygame.sprite.DirtySprite):
+    """Lines on which a bullet shot at the current launcher angle will move,
+       drawn under the bubbles.
+    """
+
+    _layer = COURSE_LAYER
 
-    def move(self):
-        self.speed_x = random.randint(-5, 5)
-        self.speed_y = random.randint(-5, 5) or 2
+    def __init__(self, shooter):
+        super().__init__(self.containers)
+        self.shooter = shooter
+        self.course = None
+        self.draw_lines()
 
     def update(self):
-        if self.status == Status.MOVE:
-            self.rect.centerx += self.speed_x
-            self.rect.centery += self.speed_y
+        course = self.shooter.course if self.shooter.dest else None
+        # the lines are drawn again only if the course is simulated again.
+        if course is not self.course:
+            self.course = course
+            self.draw_lines()
+
+    def draw_lines(self):
+        points = [pt for line in self.course or [] for pt in line]
+        if not points:
+            self.image = pygame.Surface((0, 0))
+            self.rect = self.image.get_rect()
+        else:
+            left = int(min(pt.x for pt in points)) - 2
+            top = int(min(pt.y for pt in points)) - 2
+            width = int(max(pt.x for pt in points)) - left + 3
+            height = int(max(pt.y for pt in points)) - top + 3
+            self.image = pygame.Surface((width, height), flags=pygame.SRCALPHA)
+            self.rect = self.image.get_rect(topleft=(left, top))
+            for line in self.course:
+                pygame.draw.line(self.image, Colors.DARK_GREEN.color_code,
+                                 (line.start.x - left, line.start.y - top),
+                                 (line.end.x - left, line.end.y - top), 2)
+        self.dirty = 1
 
-            if self.rect.left < WINDOW.left:
-                self.sound_pop.play()
-                self.rect.left = WINDOW.left
-                self.speed_x = -self.speed_x
 
-            if self.rect.right > WINDOW.right:
-                self.sound_pop.play()
-                self.rect.right = WINDOW.right
-                self.speed_x = -self.speed_x
+class BaseBubble(pygame.sprite.DirtySprite):
 
-            if self.rect.top < WINDOW.top:
-                self.sound_pop.play()
-                self.rect.top = WINDOW.top
-                self.speed_y = -self.speed_y
+    _layer = BUBBLE_LAYER
+    pool = []
 
-            if (idx := self.rect.collidelist(self.shooter.bars)) > -1:
-                self.sound_pop.play()
-                bar = self.shooter.bars[idx]
-                if self.rect.left <= bar.right < self.rect.right:
-                    self.rect.left = bar.right
-                    self.speed_x = -self.speed_x
-                if self.rect.right >= bar.left > self.rect.left:
-                    self.rect.right = bar.left
-                    self.speed_x = -self.speed_x
+    def __init__(self, file, color, center, shooter):
+        super().__init__(self.containers)
+        self.shooter = shooter
+        self.reset(file, color, center)
+
+    @classmethod
+    def acquire(cls, file, color, center, shooter):
+        """Return a sprite taken out of the pool, or a new one if the pool is empty.
+        """
+        if cls.pool:
+            return cls.reuse(file, color, center, shooter)
+        return cls(file, color, center, shooter)
+
+    @classmethod
+    def reuse(cls, file, color, center, shooter):
+        sprite = cls.pool.pop()
+        sprite.shooter = shooter
+        sprite.reset(file, color, center)
+        sprite.add(cls.containers)
+        return sprite
+
+    def release(self):
+        """Remove the sprite from all groups, and return it to the pool.
+        """
+        if self.alive():
+            self.kill()
+            type(self).pool.append(self)
 
-            if self.rect.bottom > WINDOW.height:
-                self.sound_pop.play()
-                self.shooter.score.add(self.rect.centerx)
-                self.kill()
+    def reset(self, file, color, center):
+        self.image = Assets.image(file)
+        self.rect = self.image.get_rect()
+        self.rect.centerx = center.x
+        self.rect.centery = center.y
+        self.color = color
+        self.status = Status.STAY
+        self.last_center = self.rect.center
+
+    def interpolate(self, alpha):
+        """Return the rect placed between the positions at the last and the current step.
+           Args:
+             alpha (float): 0 for the last step, 1 for the current step
+        """
+        x, y = self.last_center
+        return self.rect.move(round((x - self.rect.centerx) * (1 - alpha)),
+                              round((y - self.rect.centery) * (1 - alpha)))
 
 
 class Bubble(BaseBubble):
 
+    pool = []
+
     def __init__(self, file, color, center, shooter):
         super().__init__(file, color, center, shooter)
 
 
 class Bullet(BaseBubble):
 
+    _layer = MOVING_LAYER
+    pool = []
+
     def __init__(self, file, color, shooter):
         super().__init__(file, color, shooter.launcher, shooter)
-        self.idx = 0
 
-    def decide_positions(self, start, end, compare_position):
-        dx = end.x - start.x
-        dy = end.y - start.y
-        distance = (dx**2 + dy ** 2) ** 0.5
-        vx = dx * 10 / distance
-        vy = dy * 10 / distance
-        x = start.x + vx
-        y = start.y + vy
-
-        if compare_position(end, x, y):
-            pass_pt = Point(x, y)
-            yield pass_pt
-            yield from self.decide_positions(pass_pt, end, compare_position)
-        else:
-            yield self.shooter.dest.center
+    @classmethod
+    def acquire(cls, file, color, shooter):
+        if cls.pool:
+            return cls.reuse(file, color, shooter.launcher, shooter)
+        return cls(file, color, shooter)
 
-    def select_func(self, start, end):
-        if start.x == end.x:
-            return lambda end, x, y: True if end.y < y else False
-        elif start.x > end.x:
-            return lambda end, x, y: True if x > end.x else False
-        else:
-            return lambda end, x, y: True if end.x > x else False
+    def reset(self, file, color, center):
+        super().reset(file, color, center)
+        self.idx = 0
 
     def simulate_course(self):
-        """Calculate points which a bullet pass through.The last point in the Shooter.course
+        """Return the points which a bullet pass through. The last point in the Shooter.course
            is the cross-point with one of the sides of a Cell. So replace it to the center
            point of the Cell.
         """
         last = self.shooter.course[-1]
         bullet_course = self.shooter.course[:-1] + [Line(last.start, self.shooter.dest.center)]
-
-        for line in bullet_course:
-            compare_position = self.select_func(line.start, line.end)
-            for pt in self.decide_positions(line.start, line.end, compare_position):
-                yield pt
+        return FlightPath(bullet_course)
 
     def shoot(self):
-        self.course = [pt for pt in self.simulate_course()]
+        self.course = self.simulate_course()
         self.status = Status.SHOT
 
     def update(self):
-        if self.status == Status.MOVE:
-            super().update()
-
         if self.status == Status.SHOT:
+            self.last_center = self.rect.center
+            self.dirty = 1
             pt = self.course[self.idx]
             self.rect.centerx = pt.x
             self.rect.centery = pt.y
 
             if self.rect.left < WINDOW.left:
-                self.sound_pop.play()
+                self.shooter.sounds.play(SoundFiles.SOUND_POP)
                 self.rect.left = WINDOW.left
 
             if self.rect.right > WINDOW.right:
-                self.sound_pop.play()
+                self.shooter.sounds.play(SoundFiles.SOUND_POP)
                 self.rect.right = WINDOW.right
 
             if self.idx + 1 < len(self.course):
                 self.idx += 1
             else:
                 self.shooter.dest.bubble = self
-                self.sound_pop.play()
+                self.shooter.sounds.play(SoundFiles.SOUND_POP)
                 if not self.drop_same_color_bubbles():
                     self.status = Status.STAY
                 self.drop_floating_bubbles()
@@ -779,60 +1257,191 @@ class Bullet(BaseBubble):
 
     def drop_bubbles(self, cells):
         for cell in cells:
-            # to display dropping bubbles on top of all the other bubbles.
-            self.shooter.droppings_group.add(cell.bubble)
-            cell.bubble.move()
-            cell.bubble.status = Status.MOVE
+            bubble = cell.bubble
             cell.bubble = None
-
-    def _get_same_color(self, cell, cells):
-        for cell in self.shooter.scan_bubbles(cell.row, cell.col):
-            if cell.bubble and cell.bubble.color == self.color:
-                if cell not in cells:
-                    cells.add(cell)
-                    self._get_same_color(cell, cells)
+            # the sprite is no longer needed after the bubble is passed to droppings.
+            self.shooter.droppings.drop(bubble)
+            bubble.release()
 
     def drop_same_color_bubbles(self):
         """Drop bubbles that are the same color with a bullet.
            Return False if the same color bubbles are not found.
         """
-        cells = set()
-        self._get_same_color(self.shooter.dest, cells)
-        if len(cells) >= 3:
-            self.drop_bubbles(cells)
+        board = self.shooter.bitboard
+        dest = self.shooter.dest
+        same_color = board.flood(board.bit(dest.row, dest.col), board.colors[self.color])
+        if bin(same_color).count('1') >= 3:
+            self.drop_bubbles(self.shooter.find_cells(same_color))
             return True
         return False
 
-    def _get_connected(self, cell, cells):
-        for cell in self.shooter.scan_bubbles(cell.row, cell.col):
-            if cell.bubble:
-                if cell not in cells:
-                    cells.add(cell)
-                    self._get_connected(cell, cells)
-
     def drop_floating_bubbles(self):
-        """Get bubbles that are connected to the top to drop them.
+        """Drop bubbles that are not connected to the top.
+        """
+        board = self.shooter.bitboard
+        if floating := board.floating():
+            self.drop_bubbles(self.shooter.find_cells(floating))
+            # dropping floating bubbles never makes other bubbles float.
+            board.removed &= ~floating
+
+
+class Dropping:
+    """Bubbles dropping from the board. Instead of moving each bubble as a sprite,
+       their positions and speeds are held in arrays, and moved together in each step.
+    """
+
+    def __init__(self, shooter):
+        self.shooter = shooter
+        # ranges of the topleft of a bubble touching the bars: left, right, top and bottom.
+        self.bars = [(bar.left - BUBBLE_SIZE, bar.right, bar.top - BUBBLE_SIZE, bar.bottom)
+                     for bar in shooter.bars]
+        self.images = []
+        # topleft of the bubbles at the current and the last step, and their speeds.
+        self.x, self.y = array('i'), array('i')
+        self.last_x, self.last_y = array('i'), array('i')
+        self.speed_x, self.speed_y = array('i'), array('i')
+
+    def __len__(self):
+        return len(self.images)
+
+    def drop(self, bubble):
+        """Start dropping a bubble from the position where it is.
         """
-        top = [cell for cell in self.shooter.cells[0] if cell.bubble]
-        connected = set(top)
-        for cell in top:
-            self._get_connected(cell, connected)
-        bubbles = set(cell for cells in self.shooter.cells for cell in cells if cell.bubble)
-        if diff := bubbles - connected:
-            self.drop_bubbles(diff)
+        self.images.append(bubble.image)
+        self.x.append(bubble.rect.left)
+        self.y.append(bubble.rect.top)
+        self.last_x.append(bubble.rect.left)
+        self.last_y.append(bubble.rect.top)
+        self.speed_x.append(random.randint(-5, 5))
+        self.speed_y.append(random.randint(-5, 5) or 2)
+
+    def update(self):
+        if not self.images:
+            return
+
+        self.last_x[:] = self.x
+        self.last_y[:] = self.y
+        bounced, fallen = self.move_numpy() if np else self.move_python()
+
+        if bounced or fallen:
+            self.shooter.sounds.play(SoundFiles.SOUND_POP)
+        if fallen:
+            for i in fallen:
+                self.shooter.score.add(self.x[i] + BUBBLE_SIZE // 2)
+            self.stop(fallen)
+
+    def move_numpy(self):
+        """Move all of the bubbles, and bounce them off the walls and the bars.
+           Returns:
+             bool: True if any bubble bounced
+             list: indices of the bubbles which fell below the window
+        """
+        size = BUBBLE_SIZE
+        x, y, speed_x, speed_y = (np.frombuffer(arr, dtype=np.intc)
+                                  for arr in (self.x, self.y, self.speed_x, self.speed_y))
+        x += speed_x
+        y += speed_y
+
+        hit_side = (x < WINDOW.left) | (x > WINDOW.right - size)
+        speed_x[hit_side] *= -1
+        np.maximum(x, WINDOW.left, out=x)
+        np.minimum(x, WINDOW.right - size, out=x)
+        hit_top = y < WINDOW.top
+        speed_y[hit_top] *= -1
+        np.maximum(y, WINDOW.top, out=y)
+        bounced = bool(hit_side.any() or hit_top.any())
+
+        # shaped (bars, bubbles); a bubble can touch only one bar at a time.
+        left, right, top, bottom = np.array(self.bars, dtype=np.intc).T[:, :, None]
+        hit = (left < x) & (x < right) & (top < y) & (y < bottom)
+        if hit.any():
+            bounced = True
+            bar_left = (left * hit).sum(axis=0)
+            bar_right = (right * hit).sum(axis=0)
+            hit = hit.any(axis=0)
+            hit_left = hit & (x > bar_right - size)
+            x[hit_left] = bar_right[hit_left]
+            speed_x[hit_left] *= -1
+            hit_right = hit & (bar_left <= x) & (x < bar_left + size)
+            x[hit_right] = bar_left[hit_right]
+            speed_x[hit_right] *= -1
+
+        return bounced, np.flatnonzero(y > WINDOW.height - size).tolist()
+
+    def move_python(self):
+        """Do the same as move_numpy without NumPy.
+        """
+        size = BUBBLE_SIZE
+        xs, ys, speeds_x, speeds_y = self.x, self.y, self.speed_x, self.speed_y
+        bars = self.bars
+        bounced = False
+        fallen = []
+
+        for i, (x, y, speed_x, speed_y) in enumerate(zip(xs, ys, speeds_x, speeds_y)):
+            x += speed_x
+            y += speed_y
+
+            if x < WINDOW.left:
+                x, speed_x, bounced = WINDOW.left, -speed_x, True
+            if x > WINDOW.right - size:
+                x, speed_x, bounced = WINDOW.right - size, -speed_x, True
+            if y < WINDOW.top:
+                y, speed_y, bounced = WINDOW.top, -speed_y, True
+
+            for left, right, top, bottom in bars:
+                if left < x < right and top < y < bottom:
+                    bounced = True
+                    if x > right - size:
+                        x, speed_x = right, -speed_x
+                    if left <= x < left + size:
+                        x, speed_x = left, -speed_x
+
+            if y > WINDOW.height - size:
+                fallen.append(i)
+            xs[i], ys[i], speeds_x[i], speeds_y[i] = x, y, speed_x, speed_y
+
+        return bounced, fallen
+
+    def stop(self, indices):
+        """Stop dropping the bubbles at the indices.
+        """
+        indices = set(indices)
+        keep = [i for i in range(len(self.images)) if i not in indices]
+        self.images = [self.images[i] for i in keep]
+        self.x, self.y, self.last_x, self.last_y, self.speed_x, self.speed_y = (
+            array('i', (arr[i] for i in keep))
+            for arr in (self.x, self.y, self.last_x, self.last_y, self.speed_x, self.speed_y))
+
+    def draw(self, surface, alpha):
+        """Draw the bubbles between the positions at the last and the current step.
+           Args:
+             surface (pygame.Surface): surface to draw on
+             alpha (float): 0 for the last step, 1 for the current step
+           Returns:
+             Rect: the area in which the bubbles are drawn, None if no bubbles
+        """
+        if not self.images:
+            return None
+
+        xs = [x + round((last - x) * (1 - alpha)) for x, last in zip(self.x, self.last_x)]
+        ys = [y + round((last - y) * (1 - alpha)) for y, last in zip(self.y, self.last_y)]
+        surface.blits(list(zip(self.images, zip(xs, ys))), doreturn=False)
+        left, top = min(xs), min(ys)
+        return Rect(left, top, max(xs) - left + BUBBLE_SIZE, max(ys) - top + BUBBLE_SIZE)
 
 
 class StartButton(pygame.sprite.Sprite):
 
+    messages = {}
+
     def __init__(self, file, screen, shooter):
         super().__init__(self.containers)
         self.screen = screen
         self.shooter = shooter
-        self.image = pygame.image.load(file).convert_alpha()
-        self.image = pygame.transform.scale(self.image, (50, 50))
+        self.image = Assets.image(file, (50, 50))
         self.rect = self.image.get_rect()
+        self.idx = 0
         self.create_surface()
-        self.set_message_font()
         self.create_texts()
 
     def create_surface(self):
@@ -840,25 +1449,33 @@ class StartButton(pygame.sprite.Sprite):
             (SCREEN.width, SCREEN.height), flags=pygame.SRCALPHA)
         self.surface.fill(Colors.TRANSPARENT_GREEN.color_code)
 
-    def get_font(self):
-        for size in range(40, 51):
-            yield pygame.font.SysFont(None, size)
-        for size in range(50, 41, -1):
-            yield pygame.font.SysFont(None, size)
+    @staticmethod
+    def get_sizes():
+        yield from range(40, 51)
+        yield from range(50, 41, -1)
 
-    def set_message_font(self):
-        self.idx = -1
-        self.fonts = [font for font in self.get_font()]
+    @classmethod
+    def render_message(cls, text, color):
+        """Return the text rendered in each font size of the animation. The text is
+           rendered only at the first call, and shared between the screens.
+           Args:
+             text (str): message
+             color (tuple): color code
+        """
+        if (key := (text, color)) not in cls.messages:
+            rendered = {}
+            for size in cls.get_sizes():
+                if size not in rendered:
+                    rendered[size] = pygame.font.SysFont(None, size).render(text, True, color)
+            cls.messages[key] = [rendered[size] for size in cls.get_sizes()]
+        return cls.messages[key]
 
     def scale_message(self, y, text, color):
-        font = self.fonts[self.idx]
-        message = font.render(text, True, color)
-        x, _ = font.size(text)
-        self.screen.blit(message, ((WINDOW.width - x) // 2, y))
-        self.idx += 1
-        if self.idx >= len(self.fonts):
-            self.idx = -1
-        pygame.time.wait(100)
+        messages = self.render_message(text, color)
+        # the message is changed every 100 milliseconds without waiting.
+        self.idx = pygame.time.get_ticks() // 100 % len(messages)
+        message = messages[self.idx]
+        self.screen.blit(message, ((WINDOW.width - message.get_width()) // 2, y))
 
 
 class RetryGame(StartButton):
@@ -874,13 +1491,17 @@ class RetryGame(StartButton):
             'GAME OVER', True, Colors.WHITE.color_code)
         self.score_font = pygame.font.SysFont(None, 50)
         self.score = 'Score: {}'
+        self.rendered = None
         self.text = 'CONTINUE'
 
     def update(self):
         self.screen.blit(self.surface, SURFACE_LEFT)
-        score = self.score_font.render(
-            self.score.format(self.shooter.score.score), True, Colors.WHITE.color_code)
-        self.screen.blit(score, FINAL_SCORE)
+        # render the final score again only if it has been changed.
+        if self.rendered != self.shooter.score.score:
+            self.rendered = self.shooter.score.score
+            self.final_score = self.score_font.render(
+                self.score.format(self.rendered), True, Colors.WHITE.color_code)
+        self.screen.blit(self.final_score, FINAL_SCORE)
         if self.shooter.game == Status.GAMEOVER:
             self.screen.blit(self.gameover, GAMEOVER_TITLE)
         self.scale_message(CONTINUE_Y, self.text, Colors.PINK.color_code)
@@ -915,53 +1536,203 @@ class StartGame(StartButton):
             self.shooter.game = Status.PLAY
 
 
-class Game:
+class Bot:
+    """Player of the simulation. The bullet is shot at the angle at which it stops
+       next to the most bubbles of the same color.
+    """
+
+    def __init__(self, angles=range(5, 176, 5), delay=6):
+        self.angles = angles
+        # steps waited after the bullet is ready, so that the shooter can check the
+        # board and change the bubbles before the next shot, like a human player.
+        self.delay = delay
+        self.waited = 0
+
+    def evaluate(self, shooter, angle):
+        shooter.launcher_angle = angle
+        shooter.aim()
+        if not shooter.dest:
+            return -1
+        color = shooter.bullet.color
+        return sum(1 for cell in shooter.dest.neighbors
+                   if cell.bubble and cell.bubble.color == color)
+
+    def play(self, shooter):
+        """Shoot the bullet if it is ready.
+           Args:
+             shooter (Shooter): shooter of the game played by the bot
+        """
+        if shooter.status != Status.READY:
+            self.waited = 0
+            return
+
+        self.waited += 1
+        if self.waited > self.delay:
+            angle = max(self.angles, key=lambda angle: self.evaluate(shooter, angle))
+            shooter.launcher_angle = angle
+            shooter.aim()
+            shooter.shoot()
+
 
-    def __init__(self):
+class Simulation:
+    """The game logic run without a window, audio and fonts. Steps are advanced
+       as fast as possible, for bots, benchmarks and validation of games.
+    """
+
+    def __init__(self, screen=None):
+        self.bubbles = pygame.sprite.LayeredDirty()
+        Bubble.containers = self.bubbles
+        Bullet.containers = self.bubbles
+        self.score = Score()
+        self.sounds = SoundManager()
+        self.scheduler = Scheduler()
+        self.bubble_shooter = Shooter(screen, self.score, self.scheduler, self.sounds)
+
+    def set_timer(self):
+        """Increase the bubbles every two minutes, and decrease the colors every
+           30 seconds of game time during play.
+        """
+        self.scheduler.call_every(60000 * 2, self.on_play, self.bubble_shooter.increase)
+        self.scheduler.call_every(30000, self.on_play, self.bubble_shooter.decrease_colors)
+
+    def on_play(self, callback):
+        if self.bubble_shooter.game == Status.PLAY:
+            callback()
+
+    def step(self):
+        """Advance the game by one simulation step.
+        """
+        self.scheduler.advance(STEP)
+        self.bubble_shooter.update()
+        self.bubbles.update()
+        self.bubble_shooter.droppings.update()
+        self.sounds.update()
+
+    def play(self, bot, steps=STEPS_LIMIT):
+        """Play a game by the bot until it is over.
+           Args:
+             bot (Bot): player
+             steps (int): the number of steps after which the game is stopped
+           Returns:
+             int: the number of steps advanced
+        """
+        self.set_timer()
+        self.bubble_shooter.game = Status.PLAY
+
+        advanced = 0
+        while advanced < steps and self.bubble_shooter.game == Status.PLAY:
+            bot.play(self.bubble_shooter)
+            self.step()
+            advanced += 1
+        return advanced
+
+
+class Game(Simulation):
+
+    def __init__(self, fps=FPS):
         pygame.init()
+        self.fps = fps
         self.screen = pygame.display.set_mode(SCREEN.size)
         pygame.display.set_caption('PyBubbleShooter')
-        self.bubbles = pygame.sprite.RenderUpdates()
-        self.droppings = pygame.sprite.RenderUpdates()
+        super().__init__(self.screen)
         self.start = pygame.sprite.RenderUpdates()
         self.retry = pygame.sprite.RenderUpdates()
-        Bubble.containers = self.bubbles
-        Bullet.containers = self.bubbles
+        ScoreBoard.containers = self.bubbles
+        NextBullet.containers = self.bubbles
+        AimLine.containers = self.bubbles
         StartGame.containers = self.start
         RetryGame.containers = self.retry
-        self.score = Score(self.screen)
-        self.bubble_shooter = Shooter(self.screen, self.score, self.droppings)
         self.start_game = StartGame(ImageFiles.BUTTON_START.path, self.screen, self.bubble_shooter)
         self.retry_game = RetryGame(ImageFiles.BUTTON_START.path, self.screen, self.bubble_shooter)
+        self.score_board = ScoreBoard(self.score)
+        self.next_bullet = NextBullet(self.bubble_shooter)
+        self.aim_line = AimLine(self.bubble_shooter)
+        # sprites displayed only during play.
+        self.hud = [self.score_board, self.next_bullet, self.aim_line]
+        self.field = pygame.Surface(SCREEN.size)
+        self.field.fill(Colors.GREEN.color_code)
+        self.displayed = None
+        self.dropped = None
+
+    def change_screen(self):
+        """Switch the background and the sprites to be displayed when the
+           game status is changed, and repaint all of the screen.
+        """
+        self.displayed = self.bubble_shooter.game
+        is_play = self.displayed == Status.PLAY
 
-    def set_timer(self):
-        self.increase_event = pygame.USEREVENT + 1
-        pygame.time.set_timer(self.increase_event, 60000 * 2)
-        self.change_event = pygame.USEREVENT + 2
-        pygame.time.set_timer(self.change_event, 30000)
-        pygame.key.set_repeat(100, 100)
+        for sprite in self.hud:
+            sprite.visible = is_play
+
+        if is_play:
+            bgd = self.bubble_shooter.get_board()
+        else:
+            # the board does not change while the menu is displayed.
+            bgd = self.field.copy()
+            self.bubble_shooter.draw_bubbles(bgd)
+        self.bubbles.clear(self.screen, bgd)
+        self.bubbles.repaint_rect(SCREEN)
+
+    def render(self, alpha):
+        """Draw the sprites changed since the last frame. Moving bubbles are drawn
+           between the positions at the last and the current step.
+           Args:
+             alpha (float): how far the time has passed from the current step to the next
+           Returns:
+             list: rects of the screen to be updated
+        """
+        if self.bubble_shooter.game != self.displayed:
+            self.change_screen()
+
+        moving = [sprite for sprite in self.bubbles if getattr(sprite, 'status', None) == Status.SHOT]
+        rects = [sprite.rect for sprite in moving]
+        for sprite in moving:
+            sprite.rect = sprite.interpolate(alpha)
+            sprite.dirty = 1
+
+        if self.displayed == Status.PLAY:
+            for rect in self.bubble_shooter.refresh_board():
+                self.bubbles.repaint_rect(rect)
+            for sprite in self.hud:
+                sprite.update()
+            # dropping bubbles are drawn on top of everything, and erased in the next frame.
+            if self.dropped:
+                self.bubbles.repaint_rect(self.dropped)
+            dirty_rects = self.bubbles.draw(self.screen)
+            self.dropped = self.bubble_shooter.droppings.draw(self.screen, alpha)
+            if self.dropped:
+                dirty_rects.append(self.dropped)
+        else:
+            # the buttons are animated over the bubbles, so that all of the screen is drawn.
+            self.bubbles.repaint_rect(SCREEN)
+            self.bubbles.draw(self.screen)
+            if self.displayed == Status.START:
+                self.start.update()
+                self.start.draw(self.screen)
+            else:
+                self.retry.update()
+                self.retry.draw(self.screen)
+            dirty_rects = [SCREEN]
+
+        for sprite, rect in zip(moving, rects):
+            sprite.rect = rect
+        return dirty_rects
 
     def run(self):
         clock = pygame.time.Clock()
         self.set_timer()
+        pygame.key.set_repeat(100, 100)
+        lag = 0
 
         while True:
-            clock.tick(60)
-            self.screen.fill(Colors.GREEN.color_code)
+            # the simulation advances by STEP regardless of the frame rate.
+            lag = min(lag + clock.tick(self.fps), MAX_FRAME_TIME)
+            while lag >= STEP:
+                self.step()
+                lag -= STEP
+            dirty_rects = self.render(lag / STEP)
 
-            self.bubble_shooter.update()
-            self.bubbles.update()
-            self.bubbles.draw(self.screen)
-
-            if self.bubble_shooter.game == Status.START:
-                self.start.update()
-                self.start.draw(self.screen)
-            elif self.bubble_shooter.game == Status.PLAY:
-                self.droppings.draw(self.screen)
-                self.score.update()
-            elif self.bubble_shooter.game in (Status.GAMEOVER, Status.WIN):
-                self.retry.update()
-                self.retry.draw(self.screen)
+            aim_pos = None
 
             for event in pygame.event.get():
                 if event.type == QUIT:
@@ -973,10 +1744,8 @@ class Game:
                     if self.bubble_shooter.game in (Status.WIN, Status.GAMEOVER):
                         self.retry_game.click(*event.pos)
                 if self.bubble_shooter.game == Status.PLAY:
-                    if event.type == self.change_event:
-                        self.bubble_shooter.decrease_colors()
-                    if event.type == self.increase_event:
-                        self.bubble_shooter.increase()
+                    if event.type == MOUSEMOTION:
+                        aim_pos = event.pos
                     if event.type == KEYDOWN:
                         if event.key == K_RIGHT:
                             self.bubble_shooter.move_right()
@@ -985,9 +1754,41 @@ class Game:
                         if event.key == K_SPACE:
                             self.bubble_shooter.shoot()
 
-            pygame.display.update()
+            # only the last of the mouse motions in a frame is used to aim.
+            if aim_pos:
+                self.bubble_shooter.aim_at(*aim_pos)
+
+            pygame.display.update(dirty_rects)
+
+
+def non_negative_int(value):
+    if (number := int(value)) < 0:
+        raise argparse.ArgumentTypeError('{} is negative'.format(value))
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='A python implementation of BubbleShooter Game')
+    parser.add_argument('--headless', action='store_true',
+                        help='play a game by a bot without a window, audio and fonts')
+    parser.add_argument('--seed', type=int, help='seed of the random numbers')
+    parser.add_argument('--steps', type=non_negative_int, default=STEPS_LIMIT,
+                        help='the number of steps after which the headless game is stopped')
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    if args.headless:
+        simulation = Simulation()
+        start = time.perf_counter()
+        steps = simulation.play(Bot(), args.steps)
+        elapsed = time.perf_counter() - start
+        print('{}: score {}, {} steps ({:.1f} seconds of game time) in {:.2f} seconds'.format(
+            simulation.bubble_shooter.game.name, simulation.score.score,
+            steps, steps * STEP / 1000, elapsed))
+    else:
+        game = Game()
+        game.run()
 
 
 if __name__ == '__main__':
-    game = Game()
-    game.run()
\ No newline at end of file
+    main()
\ No newline at end of file
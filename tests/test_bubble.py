@@ -2,12 +2,14 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+import pygame
+
 from pathlib import Path
 from unittest import TestCase, main, mock
 
 
-from pybubble_shooter import (BaseBubble, Score, Shooter, Point, Line,
-    ROWS, COLS, Cell, BUBBLES, Status, Bullet, Bubble)
+from pybubble_shooter import (Assets, BaseBubble, Score, Shooter, Point, Line,
+    COLS, Cell, BUBBLES, SoundFiles, Status, Bullet, Bubble, Dropping, np)
 
 
 class BasicTest(TestCase):
@@ -21,6 +23,7 @@ class BasicTest(TestCase):
 
     def tearDown(self):
         mock.patch.stopall()
+        Assets.clear()
 
     def reset_rect(self, target_mock, left, right, top, bottom, collide=None):
         target_mock.rect.configure_mock(
@@ -58,132 +61,196 @@ class BaseBubbleTestCase(BasicTest):
         self.bubble = BaseBubble('test.png', 'red', Point(300, 300), shooter)
         self.bubble.status = Status.MOVE
 
-    def test_move(self):
+    def test_interpolate(self):
+        """Test that interpolate returns the rect between the last and the current positions.
+        """
+        self.bubble.rect = pygame.Rect(0, 0, 30, 30)
+        self.bubble.rect.center = (310, 290)
+        self.bubble.last_center = (300, 300)
+        tests = [(0, (300, 300)), (0.5, (305, 295)), (0.25, (303, 298)), (1, (310, 290))]
+
+        for alpha, expect in tests:
+            with self.subTest(alpha):
+                self.assertEqual(self.bubble.interpolate(alpha).center, expect)
+                self.assertEqual(self.bubble.rect.center, (310, 290))
+
+
+
+class DroppingTestCase(BasicTest):
+    """Tests for Dropping class.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.shooter = mock.create_autospec(
+            spec=Shooter, instance=True, bars=[pygame.Rect(105, 540, 5, 55)], score=Score(),
+            sounds=mock.MagicMock())
+        self.droppings = Dropping(self.shooter)
+        self.image = pygame.Surface((30, 30))
+        self.image.fill((255, 0, 0))
+
+    def drop(self, *bubbles):
+        """Drop bubbles at the topleft positions with the speeds.
+           Args:
+             bubbles (tuple): ((left, top), (speed_x, speed_y))
+        """
+        with mock.patch('pybubble_shooter.random.randint') as mock_randint:
+            for topleft, speed in bubbles:
+                mock_randint.side_effect = speed
+                bubble = mock.MagicMock(image=self.image, rect=pygame.Rect(topleft, (30, 30)))
+                self.droppings.drop(bubble)
+
+    def get_bubbles(self):
+        droppings = self.droppings
+        return list(zip(droppings.x, droppings.y, droppings.speed_x, droppings.speed_y))
+
+    def numpy_or_not(self):
+        """Return the modules to patch numpy with, to run a test with and without NumPy.
+        """
+        return [np, None] if np else [None]
+
+    def test_drop(self):
         """Test that speed_y is 2 if random.randint returns 0.
         """
+        self.drop(((200, 100), (3, -2)), ((230, 100), (0, 4)), ((260, 100), (-4, 0)))
+        self.assertEqual(
+            self.get_bubbles(), [(200, 100, 3, -2), (230, 100, 0, 4), (260, 100, -4, 2)])
+        self.assertEqual(list(self.droppings.last_x), [200, 230, 260])
+        self.assertEqual(len(self.droppings), 3)
+
+    def test_update(self):
+        """Test that the bubbles are moved, and bounced off the walls and the bars.
+        """
         tests = [
-            [(3, -2), (3, -2)],
-            [(0, 4), (0, 4)],
-            [(-4, 0), (-4, 2)]
+            # topleft, speed, expect
+            ((200, 200), (3, 3), (203, 203, 3, 3)),       # not bounced
+            ((5, 200), (-8, 3), (0, 203, 8, 3)),           # left wall
+            ((500, 200), (3, 3), (496, 203, -3, 3)),      # right wall
+            ((200, 2), (3, -5), (203, 0, 3, 5)),           # top wall
+            ((112, 550), (-3, 3), (110, 553, 3, 3)),      # the right side of the bar
+            ((72, 550), (4, 3), (75, 553, -4, 3)),        # the left side of the bar
         ]
-        with mock.patch('pybubble_shooter.random.randint') as mock_randint:
-            for return_values, expect in tests:
-                with self.subTest():
-                    mock_randint.side_effect = return_values
-                    self.bubble.move()
+        for module in self.numpy_or_not():
+            for topleft, speed, expect in tests:
+                with self.subTest(topleft, numpy=module is not None), \
+                        mock.patch('pybubble_shooter.np', module):
+                    self.droppings.stop(range(len(self.droppings)))
+                    self.shooter.sounds.reset_mock()
+                    self.drop((topleft, speed))
+                    self.droppings.update()
+                    self.assertEqual(self.get_bubbles(), [expect])
+                    self.assertEqual((self.droppings.last_x[0], self.droppings.last_y[0]), topleft)
                     self.assertEqual(
-                        (self.bubble.speed_x, self.bubble.speed_y), expect)
+                        self.shooter.sounds.play.call_args_list,
+                        [] if topleft == (200, 200) else [mock.call(SoundFiles.SOUND_POP)])
 
-    def test_update_left(self):
-        """Test that rect.left and speed_x are changed
-           when rect.left < WINDOW.left.
+    def test_update_fallen(self):
+        """Test that the bubbles fallen below the window are scored and removed.
         """
-        self.reset_rect(self.bubble, -10, 20, 200, 230, collide=-1)
-
-        with mock.patch.object(self.bubble, 'speed_x', -3), \
-                mock.patch.object(self.bubble, 'speed_y', 3):
-            self.bubble.update()
-            self.assertEqual((self.bubble.rect.centerx, self.bubble.rect.centery), (297, 303))
-            self.assertEqual((self.bubble.speed_x, self.bubble.speed_y), (3, 3))
-            self.assertEqual(self.bubble.rect.left, 0)
-            self.bubble.sound_pop.play.assert_called_once()
-
-    def test_update_right(self):
-        """Test that rect.right and speed_x are changed
-           when rect.right > WINDOW.right.
+        for module in self.numpy_or_not():
+            with self.subTest(numpy=module is not None), mock.patch('pybubble_shooter.np', module):
+                self.shooter.score.score = 0
+                self.droppings.stop(range(len(self.droppings)))
+                self.drop(((230, 575), (-3, 3)), ((300, 300), (1, 1)), ((450, 580), (2, 5)))
+                self.droppings.update()
+                self.assertEqual(self.get_bubbles(), [(301, 301, 1, 1)])
+                self.assertEqual(self.droppings.images, [self.image])
+                self.assertEqual(self.shooter.score.score, 300)
+
+    def test_draw(self):
+        """Test that the bubbles are drawn between the last and the current positions,
+           and the area in which they are drawn is returned.
         """
-        self.reset_rect(self.bubble, 506, 536, 200, 230, collide=-1)
-
-        with mock.patch.object(self.bubble, 'speed_x', 3), \
-                mock.patch.object(self.bubble, 'speed_y', 3):
-            self.bubble.update()
-            self.assertEqual((self.bubble.rect.centerx, self.bubble.rect.centery), (303, 303))
-            self.assertEqual((self.bubble.speed_x, self.bubble.speed_y), (-3, 3))
-            self.bubble.sound_pop.play.assert_called_once()
-            self.assertEqual(self.bubble.rect.right, 526)
-
-    def test_update_top(self):
-        """Test that rect.top and speed_y are changed
-           when rect.top < WINDOW.top.
+        surface = pygame.Surface((526, 650))
+        self.assertIsNone(self.droppings.draw(surface, 0.5))
+
+        self.drop(((100, 200), (10, -10)), ((300, 250), (-10, 10)))
+        self.droppings.update()
+        self.assertEqual(self.droppings.draw(surface, 0.5), pygame.Rect(105, 195, 220, 90))
+        tests = [((105, 195), (255, 0, 0)), ((324, 284), (255, 0, 0)), ((104, 195), (0, 0, 0)), ((205, 195), (0, 0, 0))]
+
+        for pos, color in tests:
+            with self.subTest(pos):
+                self.assertEqual(surface.get_at(pos)[:3], color)
+
+
+class PoolTestCase(TestCase):
+    """Tests for the pool of BaseBubble sub classes.
+    """
+
+    def setUp(self):
+        mock.patch('pybubble_shooter.pygame.image.load').start()
+        mock.patch('pybubble_shooter.pygame.mixer.Sound').start()
+        mock_scale = mock.patch('pybubble_shooter.pygame.transform.scale').start()
+        mock_scale.return_value = pygame.Surface((30, 30))
+        self.group = pygame.sprite.Group()
+        Bubble.containers = self.group
+        Bullet.containers = self.group
+        self.shooter = mock.create_autospec(spec=Shooter, launcher=Point(263, 600), instance=True)
+
+    def tearDown(self):
+        mock.patch.stopall()
+        Assets.clear()
+        Bubble.pool.clear()
+        Bullet.pool.clear()
+
+    def test_release(self):
+        """Test that a sprite is removed from groups and returned to the pool only once.
         """
-        self.reset_rect(self.bubble, 200, 230, -5, 25, collide=-1)
-
-        with mock.patch.object(self.bubble, 'speed_x', 3), \
-                mock.patch.object(self.bubble, 'speed_y', -3):
-            self.bubble.update()
-            self.assertEqual((self.bubble.rect.centerx, self.bubble.rect.centery), (303, 297))
-            self.bubble.sound_pop.play.assert_called_once()
-            self.assertEqual(self.bubble.rect.top, 0)
-            self.assertEqual((self.bubble.speed_x, self.bubble.speed_y), (3, 3))
-
-    def test_update_bottom(self):
-        """Test update method when rect.bottom > WINDOW.height.
+        bubble = Bubble.acquire('test.png', 'red', Point(100, 100), self.shooter)
+        for _ in range(2):
+            bubble.release()
+        self.assertEqual(Bubble.pool, [bubble])
+        self.assertEqual(len(self.group), 0)
+        self.assertEqual(Bullet.pool, [])
+
+    def test_acquire(self):
+        """Test that a released sprite is reset and reused.
         """
-        self.reset_rect(self.bubble, 200, 230, 575, 605, collide=-1)
-
-        with mock.patch.object(self.bubble, 'speed_x', -3), \
-                mock.patch.object(self.bubble, 'speed_y', 3):
-            self.bubble.update()
-            self.assertEqual((self.bubble.rect.centerx, self.bubble.rect.centery), (297, 303))
-            self.bubble.sound_pop.play.assert_called_once()
-            self.bubble.kill.assert_called_once()
-            self.bubble.shooter.score.add.assert_called_once()
-
-    def test_update_collid_left(self):
-        """Test update method when rect.left <= bar.right < rect.right.
+        bubble = Bubble.acquire('test.png', 'red', Point(100, 100), self.shooter)
+        bubble.status = Status.SHOT
+        bubble.release()
+        reused = Bubble.acquire('test.png', 'blue', Point(200, 150), self.shooter)
+
+        self.assertIs(reused, bubble)
+        self.assertEqual(Bubble.pool, [])
+        self.assertTrue(reused.alive())
+        self.assertEqual(reused.color, 'blue')
+        self.assertEqual(reused.status, Status.STAY)
+        self.assertEqual(reused.rect.center, (200, 150))
+
+    def test_layer(self):
+        """Test that a bullet is displayed above the bubbles.
         """
-        self.reset_rect(self.bubble, 200, 230, 550, 580, collide=0)
-        self.bar.configure_mock(**dict(right=203, left=198))
-
-        with mock.patch.object(self.bubble, 'speed_x', -3), \
-                mock.patch.object(self.bubble, 'speed_y', 3):
-            self.bubble.update()
-            self.assertEqual((self.bubble.rect.centerx, self.bubble.rect.centery), (297, 303))
-            self.bubble.sound_pop.play.assert_called_once()
-            self.assertEqual(self.bubble.rect.left, 203)
-            self.assertEqual((self.bubble.speed_x, self.bubble.speed_y), (3, 3))
-
-    def test_update_collid_right(self):
-        """Test update method when rect.right >= bar.left > rect.left.
+        group = pygame.sprite.LayeredDirty()
+        Bubble.containers = group
+        Bullet.containers = group
+        bubble = Bubble.acquire('test.png', 'red', Point(100, 100), self.shooter)
+        bullet = Bullet.acquire('test.png', 'red', self.shooter)
+        self.assertEqual((group.get_layer_of_sprite(bubble), group.get_layer_of_sprite(bullet)), (1, 2))
+
+    def test_acquire_bullet(self):
+        """Test that a released bullet is reset at the launcher.
         """
-        self.reset_rect(self.bubble, 200, 230, 550, 580, collide=0)
-        self.bar.configure_mock(**dict(right=233, left=228))
+        bullet = Bullet.acquire('test.png', 'red', self.shooter)
+        bullet.idx = 10
+        bullet.release()
+        reused = Bullet.acquire('test.png', 'blue', self.shooter)
 
-        with mock.patch.object(self.bubble, 'speed_x', 3), \
-                mock.patch.object(self.bubble, 'speed_y', 3):
-            self.bubble.update()
-            self.assertEqual((self.bubble.rect.centerx, self.bubble.rect.centery), (303, 303))
-            self.bubble.sound_pop.play.assert_called_once()
-            self.assertEqual(self.bubble.rect.right, 228)
-            self.assertEqual((self.bubble.speed_x, self.bubble.speed_y), (-3, 3))
+        self.assertIs(reused, bullet)
+        self.assertEqual(reused.idx, 0)
+        self.assertEqual(reused.rect.center, (263, 600))
+        self.assertNotIn(reused, Bubble.pool)
 
 
 class BulletTestCase(BasicTest):
 
     def setUp(self):
         super().setUp()
-        self.shooter = mock.create_autospec(spec=Shooter, launcher=Point(300, 300), instance=True)
+        self.shooter = mock.create_autospec(
+            spec=Shooter, launcher=Point(300, 300), instance=True, sounds=mock.MagicMock())
         self.bullet = Bullet('test.png', 'red', self.shooter)
 
-    def test_decide_position(self):
-        """Test decides position method.
-        """
-        cell = self.get_cell()
-        self.shooter.dest = cell
-        tests = [
-            (Point(2, 20), Point(2, 0)),
-            (Point(15, 0), Point(0, 20)),
-            (Point(0, 0), Point(4, 3))
-        ]
-        expects = [
-            [Point(2.0, 10.0), cell.center],
-            [Point(x=9.0, y=8.0), Point(x=3.0, y=16.0), Point(x=106, y=75)],
-            [Point(x=106, y=75)]
-        ]
-        for (start, end), expect in zip(tests, expects):
-            result = [pt for pt in self.bullet.decide_positions(start, end, self.bullet.select_func(start, end))]
-            self.assertEqual(result, expect)
-
     def test_simulate_course(self):
         """Test that in simulate_course method the last line
            in shooter.course is replaced.
@@ -191,20 +258,26 @@ class BulletTestCase(BasicTest):
         cell = self.get_cell()
         course = [Line(Point(263, 600), Point(0, 500)), Line(Point(0, 500), Point(526, 300))]
         self.shooter.configure_mock(**dict(dest=cell, course=course))
-        mock_func = mock.Mock()
-        expect_select_func_args = [
-            mock.call(Point(263, 600), Point(0, 500)),
-            mock.call(Point(0, 500), Point(106, 75))
-        ]
-        expect_decide_positions_args = [
-            mock.call(Point(263, 600), Point(0, 500), mock_func),
-            mock.call(Point(0, 500), Point(106, 75), mock_func)
-        ]
-        with mock.patch.object(Bullet, 'select_func', return_value=mock_func) as mock_select_func, \
-                mock.patch.object(Bullet, 'decide_positions') as mock_decide_positions:
-            _ = [pt for pt in self.bullet.simulate_course()]
-            self.assertEqual(mock_select_func.call_args_list, expect_select_func_args)
-            self.assertEqual(mock_decide_positions.call_args_list, expect_decide_positions_args)
+        expect = [Line(Point(263, 600), Point(0, 500)), Line(Point(0, 500), Point(106, 75))]
+
+        with mock.patch('pybubble_shooter.FlightPath') as mock_flight_path:
+            result = self.bullet.simulate_course()
+            mock_flight_path.assert_called_once_with(expect)
+            self.assertEqual(result, mock_flight_path.return_value)
+
+    def test_shoot(self):
+        """Test that shoot method prepares the points from the launcher to the center of dest.
+        """
+        cell = self.get_cell()
+        course = [Line(Point(263, 600), Point(0, 500)), Line(Point(0, 500), Point(100, 80))]
+        self.shooter.configure_mock(**dict(dest=cell, course=course))
+        self.bullet.shoot()
+
+        self.assertEqual(self.bullet.status, Status.SHOT)
+        self.assertAlmostEqual(self.bullet.course[0].x, 263 - 2630 / 79169 ** 0.5)
+        self.assertAlmostEqual(self.bullet.course[0].y, 600 - 1000 / 79169 ** 0.5)
+        self.assertEqual(self.bullet.course[28], Point(0, 500))
+        self.assertEqual(self.bullet.course[-1], Point(106, 75))
 
     @mock.patch.object(Bullet, 'drop_floating_bubbles')
     @mock.patch.object(Bullet, 'drop_same_color_bubbles')
@@ -219,7 +292,7 @@ class BulletTestCase(BasicTest):
                 mock.patch.object(self.bullet, 'status', Status.SHOT):
             self.bullet.update()
             self.assertEqual((self.bullet.rect.centerx, self.bullet.rect.centery), (1, 1))
-            self.bullet.sound_pop.play.assert_called_once()
+            self.shooter.sounds.play.assert_called_once_with(SoundFiles.SOUND_POP)
             self.assertEqual(self.bullet.rect.left, 0)
             self.assertEqual(self.bullet.idx, 1)
             mock_drop_color.assert_not_called()
@@ -239,7 +312,7 @@ class BulletTestCase(BasicTest):
                 mock.patch.object(self.bullet, 'status', Status.SHOT):
             self.bullet.update()
             self.assertEqual((self.bullet.rect.centerx, self.bullet.rect.centery), (2, 2))
-            self.bullet.sound_pop.play.assert_called_once()
+            self.shooter.sounds.play.assert_called_once_with(SoundFiles.SOUND_POP)
             self.assertEqual(self.bullet.rect.right, 526)
             self.assertEqual(self.bullet.idx, 2)
             mock_drop_color.assert_not_called()
@@ -261,171 +334,94 @@ class BulletTestCase(BasicTest):
                 mock.patch.object(self.bullet, 'status', Status.SHOT):
             self.bullet.update()
             self.assertEqual((self.bullet.rect.centerx, self.bullet.rect.centery), (3, 3))
-            self.bullet.sound_pop.play.assert_called_once()
+            self.shooter.sounds.play.assert_called_once_with(SoundFiles.SOUND_POP)
             self.assertEqual(self.bullet.idx, 2)
             mock_drop_color.assert_called_once()
             mock_floating.assert_called_once()
             self.assertEqual(self.bullet.shooter.status, Status.CHARGE)
             self.assertEqual(self.bullet.status, Status.STAY)
 
-    @mock.patch.object(BaseBubble, 'update')
-    def test_bullet_update_satus_move(self, mock_super_update):
-        """Test update method when bullet.status is MOVE.
-        """
-        with mock.patch.object(self.bullet, 'status', Status.MOVE):
-            self.bullet.update()
-            mock_super_update.assert_called_once()
-            self.assertEqual(self.bullet.idx, 0)
-
     def test_drop_bubbles(self):
         """Test drop_bubbles method.
         """
-        self.shooter.droppings_group = mock.MagicMock()
+        self.shooter.droppings = mock.MagicMock()
         bubble = mock.create_autospec(spec=Bubble, instance=True, status=Status.STAY)
         cell = self.get_cell(bubble)
 
         self.bullet.drop_bubbles([cell])
-        self.shooter.droppings_group.add.assert_called_once_with(bubble)
-        bubble.move.assert_called_once()
-        self.assertEqual(bubble.status, Status.MOVE)
+        self.shooter.droppings.drop.assert_called_once_with(bubble)
+        bubble.release.assert_called_once()
         self.assertEqual(cell.bubble, None)
 
+    @mock.patch('pybubble_shooter.Shooter.initialize_game')
+    @mock.patch('pybubble_shooter.pygame.font.SysFont')
+    def get_shooter(self, bubbles, mock_font, mock_initialize):
+        """Return Shooter whose cells have the bubbles.
+           Args:
+             bubbles (dict): {(row, col): color}
+        """
+        shooter = Shooter(mock.MagicMock(), mock.MagicMock())
+        for (row, col), color in bubbles.items():
+            shooter.cells[row][col].bubble = mock.MagicMock(color=color)
+        return shooter
+
     def test_drop_same_color_bubbles_not_drop(self):
         """Test that drop_same_color_bubbles returns False
            when the same color bubbles are less than three.
         """
-        red_bubble = mock.MagicMock(color='red')
-        blue_bubble = mock.MagicMock(color='blue')
-        cell_1 = self.get_cell(red_bubble)
-        cell_2 = self.get_cell(blue_bubble)
-
-        def scan_bubbles():
-            for cell in [cell_1, cell_2, cell_1]:
-                yield cell
-
-        self.shooter.dest = self.get_cell()
-        self.shooter.scan_bubbles.return_value = scan_bubbles()
+        shooter = self.get_shooter({(0, 3): 'red', (0, 4): 'blue', (1, 3): 'blue', (1, 2): 'red'})
+        bullet = Bullet('test.png', 'red', shooter)
+        shooter.dest = shooter.cells[1][2]
 
         with mock.patch.object(Bullet, 'drop_bubbles') as mock_drop_bubbles:
-            result = self.bullet.drop_same_color_bubbles()
+            result = bullet.drop_same_color_bubbles()
             self.assertEqual(result, False)
             mock_drop_bubbles.assert_not_called()
 
     def test_drop_same_color_bubbles(self):
-        """Test that drop_same_color_bubbles returns False
-           when the same color bubbles are more than three.
+        """Test that drop_same_color_bubbles returns True and drops the bubbles
+           connected to the bullet with the same color, when they are three or more.
         """
-        red_bubble = mock.MagicMock(color='red')
-        cells = set(self.get_cell(red_bubble) for _ in range(5))
-
-        def scan_bubbles():
-            for cell in cells:
-                yield cell
-
-        self.shooter.dest = self.get_cell()
-        self.shooter.scan_bubbles.return_value = scan_bubbles()
+        cells_with_red = {(8, 3), (8, 4), (8, 5), (7, 2), (7, 4), (7, 5), (9, 3)}
+        bubbles = {(r, c): 'blue' for r in range(9) for c in range(COLS)}
+        bubbles.update({pos: 'red' for pos in cells_with_red})
+        bubbles[(9, 8)] = 'red'
+        shooter = self.get_shooter(bubbles)
+        bullet = Bullet('test.png', 'red', shooter)
+        shooter.dest = shooter.cells[9][3]
 
         with mock.patch.object(Bullet, 'drop_bubbles') as mock_drop_bubbles:
-            result = self.bullet.drop_same_color_bubbles()
+            result = bullet.drop_same_color_bubbles()
             self.assertEqual(result, True)
-            mock_drop_bubbles.assert_called_once_with(cells)
-
-    @mock.patch('pybubble_shooter.Shooter.initialize_game')
-    @mock.patch('pybubble_shooter.pygame.font.SysFont')
-    def test_get_same_color(self, mock_initialize, mock_font):
-        """Test _get_same_color method.
-        """
-        cells = [[Cell(r, c) for c in range(COLS)] for r in range(ROWS)]
-        cells_with_red = {(8, 3), (8, 4), (8, 5), (7, 2), (7, 4), (7, 5)}
-
-        for i, row in enumerate(cells):
-            for j, cell in enumerate(row):
-                if (i, j) in cells_with_red:
-                    cell.bubble = mock.MagicMock(color='red')
-                elif i <= 8:
-                    cell.bubble = mock.MagicMock(color='blue')
+            mock_drop_bubbles.assert_called_once()
+            cells = mock_drop_bubbles.call_args.args[0]
+            self.assertEqual(set((cell.row, cell.col) for cell in cells), cells_with_red)
 
-        shooter = Shooter(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
-        bullet = Bullet('test.png', 'red', shooter)
-        test_cell = Cell(9, 3)
-        test_cell.bubble = mock.MagicMock(color='red')
-
-        with mock.patch.object(shooter, 'cells', cells):
-            result_set = set()
-            bullet._get_same_color(test_cell, result_set)
-            self.assertEqual(len(result_set), len(cells_with_red))
-            self.assertEqual(
-                set((cell.row, cell.col) for cell in result_set), cells_with_red)
-
-    @mock.patch('pybubble_shooter.Shooter.initialize_game')
-    @mock.patch('pybubble_shooter.pygame.font.SysFont')
-    def test_get_connected_no_floating(self, mock_initialize, mock_font):
-        """Test _get_floating method when there are no floating bubbles.
+    def test_drop_floating_bubbles_no_floating(self):
+        """Test drop_floating_bubbles method when there are no floating bubbles.
         """
-        cells = [[Cell(r, c) for c in range(COLS)] for r in range(ROWS)]
-        cells_with_bubble = {(0, 3), (1, 2), (2, 3)}
-
-        for i, row in enumerate(cells):
-            for j, cell in enumerate(row):
-                if (i, j) in cells_with_bubble:
-                    cell.bubble = mock.MagicMock()
-
-        shooter = Shooter(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        shooter = self.get_shooter({(0, 3): 'red', (1, 2): 'red', (2, 3): 'blue'})
         bullet = Bullet('test.png', 'red', shooter)
 
-        with mock.patch.object(shooter, 'cells', cells):
-            result_set = set()
-            bullet._get_connected(Cell(0, 3), result_set)
-            self.assertEqual(len(result_set), len(cells_with_bubble))
-            self.assertEqual(
-                set((cell.row, cell.col) for cell in result_set), cells_with_bubble)
-
-    @mock.patch('pybubble_shooter.Shooter.initialize_game')
-    @mock.patch('pybubble_shooter.pygame.font.SysFont')
-    def test_get_connected_some_floating(self, mock_initialize, mock_font):
-        """Test _get_floating method when there are no floating bubbles.
-        """
-        cells = [[Cell(r, c) for c in range(COLS)] for r in range(ROWS)]
-        cells_with_bubble = {(0, 2), (0, 3), (1, 1), (1, 2), (2, 2), (3, 0)}
-
-        for i, row in enumerate(cells):
-            for j, cell in enumerate(row):
-                if (i, j) in cells_with_bubble:
-                    cell.bubble = mock.MagicMock()
-
-        shooter = Shooter(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
-        bullet = Bullet('test.png', 'red', shooter)
-
-        with mock.patch.object(shooter, 'cells', cells):
-            result_set = set()
-            bullet._get_connected(Cell(0, 3), result_set)
-            self.assertEqual(len(result_set), len(cells_with_bubble) - 1)
-            result_set = set((cell.row, cell.col) for cell in result_set)
-            expect = cells_with_bubble - {(3, 0)}
-            self.assertEqual(result_set, expect)
+        with mock.patch.object(bullet, 'drop_bubbles') as mock_drop_bubbles:
+            bullet.drop_floating_bubbles()
+            mock_drop_bubbles.assert_not_called()
 
-    @mock.patch('pybubble_shooter.Shooter.initialize_game')
-    @mock.patch('pybubble_shooter.pygame.font.SysFont')
-    def test_drop_floating_bubbles(self, mock_initialize, mock_font):
-        """Test drop_floating_bubbles method.
+    def test_drop_floating_bubbles(self):
+        """Test that drop_floating_bubbles drops bubbles disconnected from the top
+           by removing a bubble.
         """
-        cells = [[Cell(r, c) for c in range(COLS)] for r in range(ROWS)]
-        cells_with_bubble = {
-            (0, 2), (0, 3), (1, 1), (1, 2), (2, 2), (3, 0), (0, 6), (1, 5), (1, 6), (2, 6), (3, 9)}
-        expect = {cells[3][0], cells[3][9]}
-
-        for i, row in enumerate(cells):
-            for j, cell in enumerate(row):
-                if (i, j) in cells_with_bubble:
-                    cell.bubble = mock.MagicMock()
-
-        shooter = Shooter(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        cells_with_bubble = {(0, 2), (0, 3), (1, 2), (2, 2), (0, 6), (1, 5), (2, 5), (3, 5)}
+        shooter = self.get_shooter({pos: 'red' for pos in cells_with_bubble})
         bullet = Bullet('test.png', 'red', shooter)
+        shooter.cells[1][5].bubble = None
+        expect = {shooter.cells[2][5], shooter.cells[3][5]}
 
-        with mock.patch.object(shooter, 'cells', cells), \
-                mock.patch.object(bullet, 'drop_bubbles') as mock_drop_bubbles:
+        with mock.patch.object(bullet, 'drop_bubbles') as mock_drop_bubbles:
             bullet.drop_floating_bubbles()
-            mock_drop_bubbles.assert_called_once_with(expect)
+            mock_drop_bubbles.assert_called_once()
+            self.assertEqual(set(mock_drop_bubbles.call_args.args[0]), expect)
+            self.assertEqual(shooter.bitboard.removed, 0)
 
 
 if __name__ == '__main__':
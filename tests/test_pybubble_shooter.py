@@ -3,13 +3,15 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 import pygame
+import random
 
 from pathlib import Path
-from unittest import TestCase, main, mock
-from pygame.locals import QUIT, MOUSEBUTTONDOWN, KEYDOWN, K_RIGHT, K_LEFT, K_SPACE
+from unittest import TestCase, main, mock, skipUnless
+from pygame.locals import QUIT, MOUSEBUTTONDOWN, MOUSEMOTION, KEYDOWN, K_RIGHT, K_LEFT, K_SPACE
 
-from pybubble_shooter import (ImageFiles, SoundFiles, round_up, round, Cell,
-    Point, Line, Score, Status, Game)
+from pybubble_shooter import (Assets, BitBoard, ImageFiles, SoundFiles, round, Cell, FlightPath, Geometry,
+    Colors, Point, Line, Scheduler, RetryGame, Score, ScoreBoard, NextBullet, AimLine, Shooter, SoundManager, StartGame, Status, Game,
+    Bot, Bubble, Bullet, Simulation, main, SCREEN, STEP, np)
 
 
 class FilesTestCase(TestCase):
@@ -44,24 +46,129 @@ class FilesTestCase(TestCase):
                 self.assertEqual(sound_file.path, expect)
 
 
-class RoundTestCase(TestCase):
-    """Tests for round functions
+class AssetsTestCase(TestCase):
+    """Tests for Assets
+    """
+
+    def tearDown(self):
+        Assets.clear()
+
+    @mock.patch('pybubble_shooter.pygame.transform.scale')
+    @mock.patch('pybubble_shooter.pygame.image.load')
+    def test_image(self, mock_load, mock_scale):
+        """Test that an image file is loaded and scaled only once for each size.
+        """
+        mock_scale.side_effect = lambda image, size: mock.MagicMock(size=size)
+        path = ImageFiles.BALL_RED.path
+        images = [Assets.image(path) for _ in range(3)]
+        button = Assets.image(path, (50, 50))
+
+        self.assertTrue(all(image is images[0] for image in images))
+        self.assertEqual(images[0].size, (30, 30))
+        self.assertEqual(button.size, (50, 50))
+        self.assertEqual(mock_load.call_count, 2)
+        mock_load.assert_called_with(path)
+
+    @mock.patch('pybubble_shooter.pygame.transform.scale')
+    @mock.patch('pybubble_shooter.pygame.image.load')
+    def test_image_convert(self, mock_load, mock_scale):
+        """Test that an image is converted only if a window has been created.
+        """
+        tests = [(None, False), (mock.MagicMock(), True)]
+
+        for surface, expect in tests:
+            with self.subTest(surface), \
+                    mock.patch('pybubble_shooter.pygame.display.get_surface', return_value=surface):
+                Assets.clear()
+                mock_load.reset_mock()
+                Assets.image(ImageFiles.BALL_RED.path)
+                self.assertEqual(mock_load.return_value.convert_alpha.called, expect)
+
+    @mock.patch('pybubble_shooter.pygame.mixer.Sound')
+    def test_sound(self, mock_sound):
+        """Test that a sound file is loaded only once.
+        """
+        mock_sound.side_effect = lambda file: mock.MagicMock()
+        sounds = [Assets.sound(SoundFiles.SOUND_POP.path) for _ in range(3)]
+        fanfare = Assets.sound(SoundFiles.FANFARE.path)
+
+        self.assertTrue(all(sound is sounds[0] for sound in sounds))
+        self.assertIsNot(fanfare, sounds[0])
+        self.assertEqual(mock_sound.call_count, 2)
+
+
+class SoundManagerTestCase(TestCase):
+    """Tests for SoundManager
     """
 
-    def test_round_up(self):
-        """Tests for round_up
+    def setUp(self):
+        mock.patch('pybubble_shooter.pygame.mixer.Sound').start()
+        self.mock_mixer = mock.patch('pybubble_shooter.pygame.mixer').start()
+        self.channels = [mock.MagicMock(name=str(i)) for i in range(4)]
+        for channel in self.channels:
+            channel.get_busy.return_value = False
+        self.mock_mixer.Channel.side_effect = self.channels
+        self.sounds = SoundManager()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        Assets.clear()
+
+    def test_coalesce(self):
+        """Test that a sound requested many times in a step is played only once,
+           on the channels reserved for it.
+        """
+        for _ in range(50):
+            self.sounds.play(SoundFiles.SOUND_POP)
+        self.sounds.play(SoundFiles.FANFARE)
+        self.sounds.update()
+
+        self.mock_mixer.set_reserved.assert_called_once_with(4)
+        self.assertEqual(self.mock_mixer.Channel.call_args_list, [mock.call(i) for i in range(4)])
+        self.channels[0].play.assert_called_once_with(Assets.sound(SoundFiles.SOUND_POP.path))
+        self.channels[3].play.assert_called_once_with(Assets.sound(SoundFiles.FANFARE.path))
+        self.assertEqual(self.sounds.requests, [])
+
+        self.sounds.update()
+        self.assertEqual(self.channels[0].play.call_count, 1)
+        self.mock_mixer.set_reserved.assert_called_once()
+
+    def test_channels(self):
+        """Test that a free channel is used, or the one that started playing
+           the longest ago if all of them are busy.
         """
         tests = [
-            (356.005, 357),
-            (189.6, 190),
-            (268.001, 269),
-            (-123.1, -124),
-            (-567.07, -568)
+            # busy channels, expect
+            ([], 0),
+            ([0], 1),
+            ([0, 1], 2),
+            ([0, 1, 2], 0),
+            ([1, 2], 0),
+            ([0, 2], 1),
         ]
-        for test, expect in tests:
-            with self.subTest(test):
-                result = round_up(test)
-                self.assertEqual(result, expect)
+        for busy, expect in tests:
+            with self.subTest(busy):
+                for i, channel in enumerate(self.channels):
+                    channel.reset_mock()
+                    channel.get_busy.return_value = i in busy
+                self.sounds.play(SoundFiles.SOUND_POP)
+                self.sounds.update()
+                played = [i for i, channel in enumerate(self.channels) if channel.play.called]
+                self.assertEqual(played, [expect])
+
+    def test_no_mixer(self):
+        """Test that nothing is played if the mixer is not initialized.
+        """
+        self.mock_mixer.get_init.return_value = None
+        self.sounds.play(SoundFiles.SOUND_POP)
+        self.sounds.update()
+        self.mock_mixer.set_reserved.assert_not_called()
+        self.assertEqual(self.sounds.requests, [])
+
+
+class RoundTestCase(TestCase):
+    """Tests for round functions
+    """
 
     def test_round(self):
         """Tests for round
@@ -80,12 +187,144 @@ class RoundTestCase(TestCase):
                 self.assertEqual(result, expect)
 
 
+class GeometryTestCase(TestCase):
+    """Tests for Geometry
+    """
+
+    def test_arrays(self):
+        """Test that centers and sides are stored at row * cols + col.
+        """
+        geometry = Geometry(rows=20, cols=17)
+        tests = [(0, 0), (1, 3), (2, 3), (19, 16)]
+        expects = [
+            (16, 15, 1, 31, 0, 30),
+            (121, 45, 106, 136, 30, 60),
+            (106, 75, 91, 121, 60, 90),
+            (511, 585, 496, 526, 570, 600)
+        ]
+        arrays = (geometry.center_x, geometry.center_y, geometry.left,
+                  geometry.right, geometry.top, geometry.bottom)
+
+        for (row, col), expect in zip(tests, expects):
+            with self.subTest((row, col)):
+                idx = row * 17 + col
+                self.assertEqual(tuple(values[idx] for values in arrays), expect)
+        self.assertTrue(all(len(values) == 20 * 17 for values in arrays))
+
+    @skipUnless(np, 'NumPy is not installed')
+    def test_crossing(self):
+        """Test that crossing agrees with Shooter.is_crossing on every cell.
+        """
+        geometry = Cell.geometry
+        cells = [Cell(row, col) for row in range(geometry.rows) for col in range(geometry.cols)]
+        shooter = Shooter.__new__(Shooter)
+        tests = [
+            (Point(263, 600), Point(0, 400)),
+            (Point(0, 400), Point(526, 90)),
+            (Point(263, 600), Point(263, 0)),
+            (Point(106, 30), Point(136, 60)),
+            (Point(10, 10), Point(12, 12))
+        ]
+        for pt1, pt2 in tests:
+            with self.subTest((pt1, pt2)):
+                result = geometry.crossing(pt1, pt2)
+                expect = [shooter.is_crossing(pt1, pt2, cell) for cell in cells]
+                self.assertEqual(result.tolist(), expect)
+
+
+class FlightPathTestCase(TestCase):
+    """Tests for FlightPath
+    """
+
+    def test_points(self):
+        """Test that points are every 10 from the start and the end is the last point.
+        """
+        tests = [
+            [Line(Point(2, 20), Point(2, 0))],
+            [Line(Point(15, 0), Point(0, 20))],
+            [Line(Point(0, 0), Point(4, 3))],
+            [Line(Point(5, 5), Point(5, 5))],
+            [Line(Point(0, 0), Point(0, 20)), Line(Point(0, 20), Point(15, 40))]
+        ]
+        expects = [
+            [Point(2, 10), Point(2, 0)],
+            [Point(9, 8), Point(3, 16), Point(0, 20)],
+            [Point(4, 3)],
+            [Point(5, 5)],
+            [Point(0, 10), Point(0, 20), Point(6, 28), Point(12, 36), Point(15, 40)]
+        ]
+        for lines, expect in zip(tests, expects):
+            with self.subTest(lines):
+                path = FlightPath(lines)
+                self.assertEqual(len(path), len(expect))
+                self.assertEqual(list(path), expect)
+                self.assertEqual(path[-1], expect[-1])
+
+    def test_index_error(self):
+        """Test that IndexError is raised if the index is out of range.
+        """
+        path = FlightPath([Line(Point(2, 20), Point(2, 0))])
+        for idx in (2, -3):
+            with self.subTest(idx):
+                with self.assertRaises(IndexError):
+                    path[idx]
+
+
+class SchedulerTestCase(TestCase):
+    """Tests for Scheduler
+    """
+
+    def test_advance(self):
+        """Test that callbacks are called in order of time when the time comes.
+        """
+        scheduler = Scheduler()
+        called = []
+        scheduler.call_later(300, called.append, 'c')
+        scheduler.call_later(100, called.append, 'a')
+        scheduler.call_later(200, called.append, 'b1')
+        scheduler.call_later(200, called.append, 'b2')
+        tests = [(99, []), (1, ['a']), (150, ['a', 'b1', 'b2']), (1000, ['a', 'b1', 'b2', 'c'])]
+
+        for elapsed, expect in tests:
+            with self.subTest(elapsed):
+                scheduler.advance(elapsed)
+                self.assertEqual(called, expect)
+        self.assertEqual(scheduler.queue, [])
+
+    def test_call_later_in_callback(self):
+        """Test that a callback scheduled by a callback is delayed from the current time.
+        """
+        scheduler = Scheduler()
+        called = []
+        scheduler.call_later(100, lambda: scheduler.call_later(100, called.append, 'second'))
+        scheduler.advance(150)
+        self.assertEqual(called, [])
+        scheduler.advance(50)
+        self.assertEqual(called, [])
+        scheduler.advance(100)
+        self.assertEqual(called, ['second'])
+
+    def test_call_every(self):
+        """Test that a callback is called at the interval from the first time even if
+           the time is advanced beyond the due time, and once for each interval passed.
+        """
+        scheduler = Scheduler()
+        called = []
+        scheduler.call_every(100, lambda: called.append(scheduler.now))
+        for _ in range(5):
+            scheduler.advance(70)
+        self.assertEqual(called, [140, 210, 350])
+        scheduler.advance(300)
+        self.assertEqual(called, [140, 210, 350, 650, 650, 650])
+        self.assertEqual(len(scheduler.queue), 1)
+
+
 class CellTestCase(TestCase):
     """Tests for Cell
     """
 
     def test_odd_row(self):
-        """Tests for calculate_sides and calculate_center
+        """Tests for center and sides
         """
         tests = [
             (1, 3),  # row is odd number.
@@ -145,19 +384,98 @@ class CellTestCase(TestCase):
         """Test for delete_bubble
         """
         mock_bubble = mock.MagicMock()
-        mock_bubble.kill.return_value = None
+        mock_bubble.release.return_value = None
 
         cell = Cell(3, 5)
         with mock.patch.object(cell, 'bubble', mock_bubble):
             cell.delete_bubble()
             self.assertEqual(cell.bubble, None)
+            mock_bubble.release.assert_called_once()
+
+
+class BitBoardTestCase(TestCase):
+    """Tests for BitBoard
+    """
+
+    def setUp(self):
+        self.board = BitBoard(rows=20, cols=17)
+
+    def get_bits(self, *positions):
+        return sum(self.board.bit(row, col) for row, col in positions)
+
+    def test_put_and_remove(self):
+        """Test that occupied and color bits are set and cleared.
+        """
+        self.board.put(2, 5, 'red')
+        self.board.put(3, 0, 'blue')
+        self.board.remove(2, 5, 'red')
+        self.assertEqual(self.board.occupied, self.get_bits((3, 0)))
+        self.assertEqual(self.board.colors['red'], 0)
+        self.assertEqual(self.board.colors['blue'], self.get_bits((3, 0)))
+
+    def test_expand(self):
+        """Test that expand adds the neighbors on the offset hex grid.
+        """
+        tests = [
+            (0, 0), (0, 5), (0, 16),
+            (2, 0), (2, 5), (2, 16),
+            (3, 0), (3, 5), (3, 16), (19, 16)]
+        expects = [
+            [(1, 0), (0, 1)],
+            [(1, 4), (1, 5), (0, 4), (0, 6)],
+            [(1, 15), (1, 16), (0, 15)],
+            [(3, 0), (2, 1), (1, 0)],
+            [(3, 4), (3, 5), (2, 4), (2, 6), (1, 4), (1, 5)],
+            [(3, 15), (3, 16), (2, 15), (1, 15), (1, 16)],
+            [(4, 1), (4, 0), (3, 1), (2, 1), (2, 0)],
+            [(4, 6), (4, 5), (3, 6), (3, 4), (2, 6), (2, 5)],
+            [(4, 16), (3, 15), (2, 16)],
+            [(19, 15), (18, 16)]]
+
+        for test, expect in zip(tests, expects):
+            with self.subTest(test):
+                result = self.board.expand(self.get_bits(test))
+                self.assertEqual(result, self.get_bits(test, *expect))
+
+    def test_flood(self):
+        """Test that flood returns the bits in the mask connected to the seed.
+        """
+        connected = [(0, 2), (0, 3), (1, 1), (1, 2), (2, 2)]
+        mask = self.get_bits(*connected, (3, 0), (3, 9))
+        result = self.board.flood(self.get_bits((0, 2), (0, 3), (0, 10)), mask)
+        self.assertEqual(result, self.get_bits(*connected))
+
+    def test_floating(self):
+        """Test that floating returns the bubbles disconnected from the top
+           by the removals since the last call.
+        """
+        for row, col in [(0, 2), (0, 3), (1, 2), (2, 2), (0, 6), (1, 5), (2, 5), (3, 5), (3, 6)]:
+            self.board.put(row, col, 'red')
+        tests = [
+            ([], 0),
+            ([(2, 2)], 0),
+            ([(1, 5)], self.get_bits((2, 5), (3, 5), (3, 6))),
+            ([], 0)
+        ]
+        for removed, expect in tests:
+            with self.subTest(removed):
+                for row, col in removed:
+                    self.board.remove(row, col, 'red')
+                self.assertEqual(self.board.floating(), expect)
+                self.assertEqual(self.board.removed, 0)
+
+    def test_positions(self):
+        """Test that positions yields (row, col) of the bits in ascending order.
+        """
+        bits = self.get_bits((3, 9), (0, 0), (19, 16), (1, 0))
+        self.assertEqual(list(self.board.positions(bits)), [(0, 0), (1, 0), (3, 9), (19, 16)])
 
 
 class ScoreTestCase(TestCase):
     """Tests for Score
     """
-    @mock.patch('pybubble_shooter.pygame.font.SysFont')
-    def test_add(self, mock_font):
+
+    def test_add(self):
         """Test add method.
         """
         tests = [
@@ -167,13 +485,286 @@ class ScoreTestCase(TestCase):
             (400, 500),
             (450, 550)
         ]
-        score = Score(mock.MagicMock())
+        score = Score()
         for x, expect in tests:
             with self.subTest():
                 score.add(x)
                 self.assertEqual(score.score, expect)
 
 
+class HudTestCase(TestCase):
+    """Tests for the sprites displayed on the panel and the field during play
+    """
+
+    def setUp(self):
+        self.group = pygame.sprite.LayeredDirty()
+        for sprite_class in (ScoreBoard, NextBullet, AimLine):
+            sprite_class.containers = self.group
+
+    @mock.patch('pybubble_shooter.pygame.font.SysFont')
+    def test_score_board(self, mock_font):
+        """Test that the score is rendered again only when it is changed.
+        """
+        render = mock_font.return_value.render
+        render.side_effect = lambda text, *args: pygame.Surface((10 * len(text), 20))
+        score = Score()
+        board = ScoreBoard(score)
+        tests = [(None, 1), (None, 1), (100, 2), (107, 2), (None, 2), (300, 3)]
+
+        for x, expect in tests:
+            with self.subTest(x):
+                board.dirty = 0
+                if x:
+                    score.add(x)
+                board.update()
+                self.assertEqual(render.call_count, expect)
+                render.assert_called_with(str(score.score), True, Colors.RIGHT_GRAY.color_code)
+                self.assertEqual(board.rect.topleft, (10, 615))
+                self.assertEqual(board.dirty, 1 if x in (100, 300) else 0)
+        self.assertEqual(board.layer, 3)
+
+    def test_next_bullet(self):
+        """Test that the dot is drawn again only when the color of the next bullet is changed.
+        """
+        shooter = mock.MagicMock(bullet_holder=Point(263, 635), next_bullet=None)
+        dot = NextBullet(shooter)
+        self.assertEqual(dot.rect.center, (263, 635))
+        tests = [
+            (Colors.RED.color_code, 1),
+            (Colors.RED.color_code, 0),
+            (Colors.BLUE.color_code, 1),
+        ]
+        for color, expect in tests:
+            with self.subTest(color):
+                dot.dirty = 0
+                shooter.next_bullet = mock.MagicMock(color_code=color)
+                dot.update()
+                self.assertEqual(dot.dirty, expect)
+                self.assertEqual(dot.image.get_at((4, 4))[:3], color)
+
+    def test_aim_line(self):
+        """Test that the lines are drawn again only when the course is simulated again,
+           and not drawn when there is no destination.
+        """
+        course = [Line(Point(263, 600), Point(0, 300)), Line(Point(0, 300), Point(100, 200))]
+        shooter = mock.MagicMock(course=course, dest=None)
+        line = AimLine(shooter)
+        self.assertEqual(line.rect.size, (0, 0))
+        self.assertEqual(line.layer, 0)
+
+        shooter.dest = mock.MagicMock()
+        line.update()
+        self.assertEqual(line.rect, pygame.Rect(-2, 198, 268, 405))
+        self.assertEqual(line.image.get_at((52, 52))[:3], Colors.DARK_GREEN.color_code)
+        self.assertEqual(line.image.get_at((200, 100))[3], 0)
+
+        line.dirty = 0
+        line.update()
+        self.assertEqual(line.dirty, 0)
+        shooter.course = course[:]
+        line.update()
+        self.assertEqual(line.dirty, 1)
+
+
+class BotTestCase(TestCase):
+    """Tests for Bot
+    """
+
+    def setUp(self):
+        red, blue = mock.MagicMock(color='red'), mock.MagicMock(color='blue')
+        # destinations for the angles, and the bubbles around them.
+        self.dests = {
+            30: mock.MagicMock(neighbors=[mock.MagicMock(bubble=bubble) for bubble in (red, blue, None)]),
+            60: mock.MagicMock(neighbors=[mock.MagicMock(bubble=bubble) for bubble in (red, red, blue)]),
+            90: None,
+            120: mock.MagicMock(neighbors=[mock.MagicMock(bubble=bubble) for bubble in (blue, None)]),
+        }
+        self.shooter = mock.MagicMock(status=Status.READY, dest=None, launcher_angle=90)
+        self.shooter.bullet.color = 'red'
+        self.shooter.aim.side_effect = lambda: setattr(
+            self.shooter, 'dest', self.dests[self.shooter.launcher_angle])
+
+    def test_play(self):
+        """Test that the bullet is shot at the angle at which it stops next to
+           the most bubbles of the same color, after waiting for the delay.
+        """
+        bot = Bot(angles=list(self.dests), delay=2)
+        for _ in range(2):
+            bot.play(self.shooter)
+            self.shooter.shoot.assert_not_called()
+
+        bot.play(self.shooter)
+        self.shooter.shoot.assert_called_once()
+        self.assertEqual(self.shooter.launcher_angle, 60)
+
+    def test_play_not_ready(self):
+        """Test that the bot waits again after the bullet is shot.
+        """
+        bot = Bot(angles=list(self.dests), delay=1)
+        tests = [(Status.READY, 0), (Status.SHOT, 0), (Status.READY, 0), (Status.READY, 1)]
+
+        for status, expect in tests:
+            with self.subTest(status):
+                self.shooter.status = status
+                bot.play(self.shooter)
+                self.assertEqual(self.shooter.shoot.call_count, expect)
+
+
+class SimulationTestCase(TestCase):
+    """Tests for Simulation
+    """
+
+    def setUp(self):
+        mock.patch('pybubble_shooter.pygame.image.load', return_value=pygame.Surface((30, 30))).start()
+        self.mock_sysfont = mock.patch('pybubble_shooter.pygame.font.SysFont').start()
+        self.mock_sound = mock.patch('pybubble_shooter.pygame.mixer.Sound').start()
+        self.mock_set_mode = mock.patch('pybubble_shooter.pygame.display.set_mode').start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        Assets.clear()
+        Bubble.pool.clear()
+        Bullet.pool.clear()
+
+    def test_play(self):
+        """Test that a game is played by the bot without a window, fonts and sounds.
+        """
+        random.seed(1)
+        simulation = Simulation()
+        shooter = simulation.bubble_shooter
+        steps = simulation.play(Bot(), 3000)
+
+        self.assertEqual(steps, 3000)
+        self.assertEqual(shooter.game, Status.PLAY)
+        self.assertGreater(simulation.score.score, 0)
+        self.assertLess(shooter.total, 170)
+        self.assertAlmostEqual(simulation.scheduler.now, STEP * 3000)
+        self.mock_set_mode.assert_not_called()
+        self.mock_sysfont.assert_not_called()
+        self.mock_sound.assert_not_called()
+
+    def test_play_over(self):
+        """Test that the simulation stops when the game is over.
+        """
+        simulation = Simulation()
+        with mock.patch.object(simulation.bubble_shooter, 'update') as mock_update:
+            mock_update.side_effect = lambda: setattr(simulation.bubble_shooter, 'game', Status.WIN)
+            self.assertEqual(simulation.play(Bot()), 1)
+
+    def test_play_no_steps(self):
+        """Test that no step is advanced if steps is 0.
+        """
+        simulation = Simulation()
+        with mock.patch.object(simulation, 'step') as mock_step:
+            self.assertEqual(simulation.play(Bot(), 0), 0)
+            mock_step.assert_not_called()
+
+    @mock.patch('pybubble_shooter.Simulation')
+    def test_main_steps(self, mock_simulation):
+        """Test that the number of steps given on the command line is passed to
+           the simulation, and rejected if negative.
+        """
+        mock_simulation.return_value.play.return_value = 0
+        mock_simulation.return_value.bubble_shooter.game = Status.PLAY
+        tests = [('0', 0), ('100', 100), ('-1', None), ('a', None)]
+
+        for steps, expect in tests:
+            with self.subTest(steps), \
+                    mock.patch('sys.argv', ['pybubble_shooter.py', '--headless', '--steps', steps]), \
+                    mock.patch('sys.stdout'), mock.patch('sys.stderr'):
+                mock_simulation.reset_mock()
+                if expect is None:
+                    with self.assertRaises(SystemExit):
+                        main()
+                    mock_simulation.assert_not_called()
+                else:
+                    main()
+                    self.assertEqual(mock_simulation.return_value.play.call_args[0][1], expect)
+
+
+class StartGameTestCase(TestCase):
+    """Tests for StartGame
+    """
+
+    def setUp(self):
+        StartGame.containers = mock.MagicMock()
+        mock.patch('pybubble_shooter.pygame.image.load').start()
+        mock.patch('pybubble_shooter.pygame.transform.scale').start()
+        self.mock_font = mock.patch('pybubble_shooter.pygame.font.SysFont').start()
+        self.mock_font.side_effect = lambda name, size: mock.MagicMock(
+            **{'render.return_value.get_width.return_value': size * 2})
+        self.mock_time = mock.patch('pybubble_shooter.pygame.time').start()
+        self.screen = mock.MagicMock()
+        self.start_game = StartGame('test.png', self.screen, mock.MagicMock())
+
+    def tearDown(self):
+        mock.patch.stopall()
+        Assets.clear()
+        StartGame.messages.clear()
+
+    def test_render_message(self):
+        """Test that the message is rendered once in each font size, and shared.
+        """
+        self.mock_font.reset_mock()
+        messages = StartGame.render_message('START', Colors.PINK.color_code)
+        widths = [message.get_width() for message in messages]
+
+        self.assertEqual(widths, [size * 2 for size in list(range(40, 51)) + list(range(50, 41, -1))])
+        self.assertEqual(self.mock_font.call_count, 11)
+        self.assertIs(RetryGame.render_message('START', Colors.PINK.color_code), messages)
+        self.assertEqual(self.mock_font.call_count, 11)
+
+    def test_scale_message(self):
+        """Test that the message is changed every 100 milliseconds without waiting.
+        """
+        tests = [(0, 0, 80), (99, 0, 80), (100, 1, 82), (1050, 10, 100), (1150, 11, 100), (2000, 0, 80), (2150, 1, 82)]
+        self.screen.reset_mock()
+
+        for ticks, expect, width in tests:
+            with self.subTest(ticks):
+                self.mock_time.get_ticks.return_value = ticks
+                self.start_game.update()
+                self.assertEqual(self.start_game.idx, expect)
+                message = StartGame.messages[('START', Colors.PINK.color_code)][expect]
+                self.screen.blit.assert_called_with(message, ((526 - width) // 2, 320))
+        self.mock_time.wait.assert_not_called()
+
+
+class RetryGameTestCase(TestCase):
+    """Tests for RetryGame
+    """
+
+    def setUp(self):
+        RetryGame.containers = mock.MagicMock()
+        mock.patch('pybubble_shooter.pygame.image.load').start()
+        mock.patch('pybubble_shooter.pygame.transform.scale').start()
+        mock.patch('pybubble_shooter.pygame.time').start()
+        self.mock_font = mock.patch('pybubble_shooter.pygame.font.SysFont').start()
+        self.mock_font.side_effect = lambda name, size: mock.MagicMock()
+        self.shooter = mock.MagicMock(game=Status.WIN)
+        self.screen = mock.MagicMock()
+        self.retry_game = RetryGame('test.png', self.screen, self.shooter)
+
+    def tearDown(self):
+        mock.patch.stopall()
+        Assets.clear()
+        RetryGame.messages.clear()
+
+    def test_update_score(self):
+        """Test that the final score is rendered again only if it has been changed.
+        """
+        render = self.retry_game.score_font.render
+        tests = [(100, 1), (100, 1), (250, 2), (250, 2)]
+
+        for score, expect in tests:
+            with self.subTest(score):
+                self.shooter.score.score = score
+                self.retry_game.update()
+                self.assertEqual(render.call_count, expect)
+                render.assert_called_with('Score: {}'.format(score), True, Colors.WHITE.color_code)
+                self.screen.blit.assert_any_call(render.return_value, (30, 30))
+
+
 class MainTestCase(TestCase):
     """Test for main function
     """
@@ -181,21 +772,29 @@ class MainTestCase(TestCase):
     def setUp(self):
         patchers = [
             mock.patch('pybubble_shooter.pygame.display.set_caption'),
-            mock.patch('pybubble_shooter.pygame.time'),
             mock.patch('pybubble_shooter.pygame.key.set_repeat'),
         ]
         for patcher in patchers:
             patcher.start()
 
+        self.mock_time = mock.patch('pybubble_shooter.pygame.time').start()
+        self.mock_tick = self.mock_time.Clock.return_value.tick
+        self.mock_tick.return_value = STEP
+
         mock_set_mode = mock.patch('pybubble_shooter.pygame.display.set_mode').start()
         self.mock_screen = mock.MagicMock()
         mock_set_mode.return_value = self.mock_screen
         mock_Score = mock.patch("pybubble_shooter.Score").start()
         self.mock_score = mock.MagicMock()
         mock_Score.return_value = self.mock_score
+        self.mock_scoreboard = mock.patch("pybubble_shooter.ScoreBoard").start().return_value
+        self.mock_nextbullet = mock.patch("pybubble_shooter.NextBullet").start().return_value
+        self.mock_aimline = mock.patch("pybubble_shooter.AimLine").start().return_value
+        self.mock_sounds = mock.patch("pybubble_shooter.SoundManager").start().return_value
         mock_Shooter = mock.patch("pybubble_shooter.Shooter").start()
         self.mock_shooter = mock.MagicMock()
         mock_Shooter.return_value = self.mock_shooter
+        self.mock_shooter.droppings.draw.return_value = None
         mock_StartGame = mock.patch("pybubble_shooter.StartGame").start()
         self.mock_startgame = mock.MagicMock()
         mock_StartGame.return_value = self.mock_startgame
@@ -205,11 +804,11 @@ class MainTestCase(TestCase):
         self.mock_event_get = mock.patch("pybubble_shooter.pygame.event.get").start()
 
         self.bubbles = mock.MagicMock()
-        self.droppings = mock.MagicMock()
         self.start = mock.MagicMock()
         self.retry = mock.MagicMock()
+        mock.patch("pygame.sprite.LayeredDirty").start().return_value = self.bubbles
         mock_renderupdate = mock.patch("pygame.sprite.RenderUpdates").start()
-        mock_renderupdate.side_effect = [self.bubbles, self.droppings, self.start, self.retry]
+        mock_renderupdate.side_effect = [self.start, self.retry]
         self.game = Game()
 
     def tearDown(self):
@@ -250,7 +849,7 @@ class MainTestCase(TestCase):
         self.check_update_called(self.mock_shooter, self.bubbles, self.start)
         self.check_draw_called(self.bubbles, self.start)
         self.check_not_called(
-            self.droppings.draw, self.mock_score.update, self.retry.update, self.retry.draw)
+            self.mock_scoreboard.update, self.mock_aimline.update, self.retry.update, self.retry.draw)
 
     def test_game_status_play(self):
         """Test that play screen and score are updated
@@ -259,8 +858,9 @@ class MainTestCase(TestCase):
         self.set_dummy_event(dict(type=QUIT))
         self.run_main(Status.PLAY)
 
-        self.check_update_called(self.mock_shooter, self.bubbles, self.mock_score)
-        self.check_draw_called(self.bubbles, self.droppings)
+        self.check_update_called(
+            self.mock_shooter, self.bubbles, self.mock_scoreboard, self.mock_nextbullet, self.mock_aimline)
+        self.check_draw_called(self.bubbles)
         self.check_not_called(self.start.update, self.start.draw, self.retry.update, self.retry.draw)
 
     def test_game_status_gameover(self):
@@ -272,7 +872,7 @@ class MainTestCase(TestCase):
         self.check_update_called(self.mock_shooter, self.bubbles, self.retry)
         self.check_draw_called(self.bubbles, self.retry)
         self.check_not_called(
-            self.start.update, self.start.draw, self.droppings.draw, self.mock_score.update)
+            self.start.update, self.start.draw, self.mock_scoreboard.update, self.mock_aimline.update)
 
     def test_game_status_win(self):
         """Test that retry screen is updated when shooter.game status is win.
@@ -283,27 +883,28 @@ class MainTestCase(TestCase):
         self.check_update_called(self.mock_shooter, self.bubbles, self.retry)
         self.check_draw_called(self.bubbles, self.retry)
         self.check_not_called(
-            self.start.update, self.start.draw, self.droppings.draw, self.mock_score.update)
+            self.start.update, self.start.draw, self.mock_scoreboard.update, self.mock_aimline.update)
 
-    def test_original_event_type(self):
-        """Test that Shooter.increase is called when shooter.game status
-           is PLAY and even.type is pygame.USEREVENT + 1.
+    def test_timer(self):
+        """Test that the bubbles are increased every two minutes and the colors are
+           decreased every 30 seconds of game time, only during play.
         """
-        self.set_dummy_event(
-            dict(type=pygame.USEREVENT + 1), dict(type=QUIT))
-        self.run_main(Status.PLAY)
-
-        self.mock_shooter.increase.assert_called_once()
-
-    def test_original_event_decrease(self):
-        """Test that Shooter.increase is called when shooter.game status
-           is PLAY and even.type is pygame.USEREVENT + 1.
-        """
-        self.set_dummy_event(
-            dict(type=pygame.USEREVENT + 2), dict(type=QUIT))
-        self.run_main(Status.PLAY)
-
-        self.mock_shooter.decrease_colors.assert_called_once()
+        tests = [
+            # game status, expected calls of increase and decrease_colors
+            (Status.PLAY, 1, 4),
+            (Status.START, 0, 0),
+        ]
+        for status, increase, decrease in tests:
+            with self.subTest(status), \
+                    mock.patch.object(self.mock_shooter, 'game', status, create=True):
+                self.mock_shooter.reset_mock()
+                self.game.scheduler = Scheduler()
+                self.game.set_timer()
+                self.game.scheduler.advance(29999)
+                self.mock_shooter.decrease_colors.assert_not_called()
+                self.game.scheduler.advance(90001)
+                self.assertEqual(self.mock_shooter.increase.call_count, increase)
+                self.assertEqual(self.mock_shooter.decrease_colors.call_count, decrease)
 
     def test_event_type_kright(self):
         """Test that Shooter.increase is called when shooter.game status
@@ -356,6 +957,135 @@ class MainTestCase(TestCase):
             self.mock_shooter.shoot,
             self.mock_shooter.increase)
 
+    def test_fixed_timestep(self):
+        """Test that the simulation is advanced according to the elapsed time,
+           up to MAX_FRAME_TIME, and rendered once per frame.
+        """
+        tests = [(5, 0), (STEP, 1), (40, 2), (1000, 15)]
+
+        for elapsed, steps in tests:
+            with self.subTest(elapsed):
+                self.mock_shooter.reset_mock()
+                self.bubbles.reset_mock()
+                self.mock_tick.return_value = elapsed
+                self.set_dummy_event(dict(type=QUIT))
+                self.run_main(Status.PLAY)
+                self.assertEqual(self.mock_shooter.update.call_count, steps)
+                self.bubbles.draw.assert_called_once()
+
+    def test_step(self):
+        """Test that a step advances the game time of the scheduler and updates sprites.
+        """
+        self.game.step()
+        self.game.step()
+        self.assertEqual(self.game.scheduler.now, STEP * 2)
+        self.assertEqual(self.mock_shooter.update.call_count, 2)
+        self.assertEqual(self.bubbles.update.call_count, 2)
+        self.assertEqual(self.mock_shooter.droppings.update.call_count, 2)
+        self.assertEqual(self.mock_sounds.update.call_count, 2)
+
+    def test_render_interpolation(self):
+        """Test that moving bubbles are drawn between the last and the current positions,
+           and put back after drawn.
+        """
+        sprites = [mock.MagicMock(status=status) for status in (Status.SHOT, Status.SHOT, Status.STAY)]
+        rects = [sprite.rect for sprite in sprites]
+        self.bubbles.__iter__.return_value = sprites
+        drawn = []
+        self.bubbles.draw.side_effect = lambda _: drawn.extend(sprite.rect for sprite in sprites)
+
+        with mock.patch.object(self.mock_shooter, 'game', Status.PLAY, create=True):
+            self.game.render(0.4)
+
+        self.mock_shooter.droppings.draw.assert_called_once_with(self.mock_screen, 0.4)
+        sprites[0].interpolate.assert_called_once_with(0.4)
+        sprites[1].interpolate.assert_called_once_with(0.4)
+        sprites[2].interpolate.assert_not_called()
+        self.assertEqual(
+            drawn, [sprites[0].interpolate.return_value, sprites[1].interpolate.return_value, rects[2]])
+        self.assertEqual([sprite.rect for sprite in sprites], rects)
+        self.assertEqual([sprite.dirty for sprite in sprites[:2]], [1, 1])
+
+    def test_render_dirty_rects(self):
+        """Test that only the changed rects are returned during play, and that all
+           of the screen is repainted when the game status is changed.
+        """
+        self.bubbles.draw.return_value = [pygame.Rect(1, 2, 3, 4)]
+        hud = [self.mock_scoreboard, self.mock_nextbullet, self.mock_aimline]
+        self.mock_shooter.refresh_board.return_value = [pygame.Rect(5, 6, 7, 8)]
+        board = self.mock_shooter.get_board.return_value
+        tests = [
+            (Status.START, 'menu', False, 2, [SCREEN]),
+            (Status.PLAY, board, True, 2, [pygame.Rect(1, 2, 3, 4)]),
+            (Status.PLAY, None, True, 1, [pygame.Rect(1, 2, 3, 4)]),
+            (Status.GAMEOVER, 'menu', False, 2, [SCREEN]),
+        ]
+        for status, bgd, visible, repaint, expect in tests:
+            with self.subTest(status):
+                self.bubbles.reset_mock()
+                self.mock_shooter.draw_bubbles.reset_mock()
+                with mock.patch.object(self.mock_shooter, 'game', status, create=True):
+                    self.assertEqual(self.game.render(0), expect)
+                if bgd is None:
+                    self.bubbles.clear.assert_not_called()
+                elif bgd == 'menu':
+                    # the menu is displayed on the field with the bubbles in the cells.
+                    menu = self.mock_shooter.draw_bubbles.call_args.args[0]
+                    self.assertIsNot(menu, self.game.field)
+                    self.assertEqual(menu.get_at((0, 0))[:3], Colors.GREEN.color_code)
+                    self.bubbles.clear.assert_called_once_with(self.mock_screen, menu)
+                else:
+                    self.bubbles.clear.assert_called_once_with(self.mock_screen, bgd)
+                if status == Status.PLAY:
+                    self.bubbles.repaint_rect.assert_called_with(pygame.Rect(5, 6, 7, 8))
+                self.assertEqual(self.bubbles.repaint_rect.call_count, repaint)
+                self.assertEqual([sprite.visible for sprite in hud], [visible] * 3)
+
+    def test_render_droppings(self):
+        """Test that dropping bubbles are drawn over the sprites, and erased in the next frame.
+        """
+        self.bubbles.draw.side_effect = lambda _: [pygame.Rect(1, 2, 3, 4)]
+        droppings = self.mock_shooter.droppings
+        tests = [
+            (pygame.Rect(10, 20, 30, 40), [pygame.Rect(1, 2, 3, 4), pygame.Rect(10, 20, 30, 40)]),
+            (None, [pygame.Rect(1, 2, 3, 4)]),
+            (None, [pygame.Rect(1, 2, 3, 4)]),
+        ]
+        with mock.patch.object(self.mock_shooter, 'game', Status.PLAY, create=True):
+            self.game.render(0)
+            for dropped, expect in tests:
+                with self.subTest(dropped):
+                    last = self.game.dropped
+                    self.bubbles.repaint_rect.reset_mock()
+                    droppings.draw.return_value = dropped
+                    self.assertEqual(self.game.render(0.5), expect)
+                    droppings.draw.assert_called_with(self.mock_screen, 0.5)
+                    if last:
+                        self.bubbles.repaint_rect.assert_called_once_with(last)
+                    else:
+                        self.bubbles.repaint_rect.assert_not_called()
+
+    def test_mouse_motion(self):
+        """Test that Shooter.aim_at is called once with the last position
+           even if the mouse is moved several times in a frame.
+        """
+        self.mock_event_get.side_effect = [
+            [mock.MagicMock(type=MOUSEMOTION, pos=pos) for pos in [(2, 3), (4, 5), (6, 7)]],
+            [mock.MagicMock(type=QUIT)]
+        ]
+        with mock.patch('pybubble_shooter.pygame.display.update'):
+            self.run_main(Status.PLAY)
+
+        self.mock_shooter.aim_at.assert_called_once_with(6, 7)
+
+    def test_mouse_motion_not_play(self):
+        """Test that Shooter.aim_at is not called when shooter.game status is not PLAY.
+        """
+        self.set_dummy_event(dict(type=MOUSEMOTION, pos=(2, 3)), dict(type=QUIT))
+        self.run_main(Status.START)
+
+        self.mock_shooter.aim_at.assert_not_called()
+
     def test_mouse_start(self):
         """Test that game starts when event.type is MOUSEBUTTON
            if game status is START.
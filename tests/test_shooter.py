@@ -2,12 +2,14 @@ import os
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+import pygame
+
 from pathlib import Path
-from unittest import TestCase, main, mock
+from unittest import TestCase, main, mock, skipUnless
 
 
-from pybubble_shooter import (ImageFiles, SoundFiles, Score, Shooter, Point, Line,
-    ROWS, COLS, Cell, BUBBLES, Status)
+from pybubble_shooter import (Assets, Colors, ImageFiles, SoundFiles, Score, Shooter, Point, Line,
+    ROWS, COLS, Cell, BUBBLES, Status, np)
 
 
 class ShooterBasicTest(TestCase):
@@ -16,17 +18,18 @@ class ShooterBasicTest(TestCase):
     def setUp(self):
         self.Bullet = mock.patch('pybubble_shooter.Bullet').start()
         self.Bubble = mock.patch('pybubble_shooter.Bubble').start()
+        mock.patch('pybubble_shooter.Dropping').start()
 
         mock.patch('pybubble_shooter.pygame.mixer.Sound').start()
-        mock.patch('pybubble_shooter.pygame.font.SysFont').start()
+        self.mock_sysfont = mock.patch('pybubble_shooter.pygame.font.SysFont').start()
 
         screen = mock.MagicMock()
-        dropping = mock.MagicMock()
         score = mock.MagicMock()
-        self.shooter = Shooter(screen, dropping, score)
+        self.shooter = Shooter(screen, score, sounds=mock.MagicMock())
 
     def tearDown(self):
         mock.patch.stopall()
+        Assets.clear()
 
     def get_cell(self):
         cell = mock.create_autospec(
@@ -48,6 +51,14 @@ class ShooterBasicTest(TestCase):
         return mock.create_autospec(
             spec=Cell, spec_set=True, instance=True, row=row, col=col, bubble=bubble)
 
+    def set_bubbles(self, has_bubble):
+        """Put a bubble into the cells of the shooter for which has_bubble(row, col)
+           returns True, and empty the others.
+        """
+        for cells in self.shooter.cells:
+            for cell in cells:
+                cell.bubble = mock.MagicMock(color='red') if has_bubble(cell.row, cell.col) else None
+
     def check_not_called(self, *methods):
         for method in methods:
             method.assert_not_called()
@@ -66,7 +77,7 @@ class ChargeTestCase(ShooterBasicTest):
         super().setUp()
         self.mock_get_bubble = mock.patch('pybubble_shooter.Shooter.get_bubble').start()
         self.mock_bullet = mock.MagicMock()
-        self.mock_bullet.kill.return_value = None
+        self.mock_bullet.release.return_value = None
         self.bullets = [BUBBLES[0], BUBBLES[1]]
 
     def test_charge_next_bullet_is_not_None(self):
@@ -76,14 +87,14 @@ class ChargeTestCase(ShooterBasicTest):
         new_next_bullet = BUBBLES[1]
         self.mock_get_bubble.return_value = new_next_bullet
         new_bullet = mock.MagicMock()
-        self.Bullet.return_value = new_bullet
+        self.Bullet.acquire.return_value = new_bullet
 
         with mock.patch.object(self.shooter, 'next_bullet', now_next_bullet, create=True), \
                 mock.patch.object(self.shooter, 'bullet', self.mock_bullet):
             self.shooter.charge()
-            self.mock_bullet.kill.assert_not_called()
+            self.mock_bullet.release.assert_not_called()
             self.mock_get_bubble.assert_called_once()
-            self.Bullet.assert_called_once_with(
+            self.Bullet.acquire.assert_called_once_with(
                 now_next_bullet.file.path, now_next_bullet.color, self.shooter)
             self.assertEqual(self.shooter.next_bullet, new_next_bullet)
             self.assertEqual(self.shooter.bullet, new_bullet)
@@ -96,9 +107,9 @@ class ChargeTestCase(ShooterBasicTest):
         with mock.patch.object(self.shooter, 'next_bullet', None, create=True), \
                 mock.patch.object(self.shooter, 'bullet', self.mock_bullet):
             self.shooter.charge()
-            self.mock_bullet.kill.assert_called_once()
+            self.mock_bullet.release.assert_called_once()
             self.assertEqual(self.mock_get_bubble.call_count, 2)
-            self.Bullet.assert_called_once_with(
+            self.Bullet.acquire.assert_called_once_with(
                 self.bullets[0].file.path, self.bullets[0].color, self.shooter)
             self.assertEqual(self.shooter.next_bullet, self.bullets[1])
 
@@ -107,12 +118,12 @@ class ChargeTestCase(ShooterBasicTest):
         """
         self.mock_get_bubble.side_effect = self.bullets
         new_bullet = mock.MagicMock()
-        self.Bullet.return_value = new_bullet
+        self.Bullet.acquire.return_value = new_bullet
 
         with mock.patch.object(self.shooter, 'next_bullet', None, create=True):
             self.shooter.charge()
             self.assertEqual(self.mock_get_bubble.call_count, 2)
-            self.Bullet.assert_called_once_with(
+            self.Bullet.acquire.assert_called_once_with(
                 self.bullets[0].file.path, self.bullets[0].color, self.shooter)
             self.assertEqual(self.shooter.next_bullet, self.bullets[1])
             self.assertEqual(self.shooter.bullet, new_bullet)
@@ -205,9 +216,13 @@ class FindDestinationTestCase(ShooterBasicTest):
     def run_test_of_trace(self, cells, start, end, expects, side_effect):
         """Run a test of _trace method.
         """
-        with mock.patch.object(self.shooter, 'cells', cells), \
-                mock.patch('pybubble_shooter.Shooter.is_crossing') as mock_is_crossing:
-            mock_is_crossing.side_effect = side_effect
+        step = 1 if start.x >= end.x else -1
+        flags = iter(side_effect)
+        crossed = [[cell for cell, flag in zip(row[::step], flags) if flag][::step]
+                   for row in cells[::-1]]
+
+        with mock.patch('pybubble_shooter.Shooter._cross') as mock_cross:
+            mock_cross.return_value = iter(row for row in crossed if row)
             traced = [cell for cell in self.shooter._trace(start, end)]
 
             self.assertEqual(len(traced), len(expects))
@@ -269,10 +284,67 @@ class FindDestinationTestCase(ShooterBasicTest):
         ]
         self.run_test_of_trace(cells, start, end, expects, side_effect)
 
-    def test_scan_bubbles(self):
-        """Test scan_bubbles method.
+    def test_walk(self):
+        """Test that _walk yields all of the cells intersecting a line,
+           row by row from bottom to top.
+        """
+        tests = [
+            (Point(263, 600), Point(0, 400)),
+            (Point(263, 600), Point(526, 150)),
+            (Point(263, 600), Point(200, 0)),
+            (Point(0, 400), Point(526, 90)),
+            (Point(526, 317), Point(0, 22)),
+            (Point(263, 600), Point(263, 0)),
+            (Point(31, 60), Point(31, 0))
+        ]
+        for start, end in tests:
+            with self.subTest((start, end)):
+                walked = [cells for cells in self.shooter._walk(start, end)]
+                result = set(cell for cells in walked for cell in cells)
+                expect = set(cell for cells in self.shooter.cells for cell in cells
+                             if self.shooter.is_crossing(start, end, cell))
+                self.assertTrue(expect <= result)
+                self.assertTrue(len(result) < ROWS * COLS // 4)
+                rows = [cells[0].row for cells in walked]
+                self.assertEqual(rows, sorted(rows, reverse=True))
+
+    def run_test_of_cross(self):
+        """Run a test of _cross method.
+        """
+        tests = [
+            (Point(263, 600), Point(0, 400)),
+            (Point(263, 600), Point(526, 150)),
+            (Point(263, 600), Point(200, 0)),
+            (Point(0, 400), Point(526, 90)),
+            (Point(526, 317), Point(0, 22)),
+            (Point(263, 600), Point(263, 0)),
+            (Point(31, 60), Point(31, 0))
+        ]
+        for start, end in tests:
+            with self.subTest((start, end)):
+                crossed = [cells for cells in self.shooter._cross(start, end)]
+                expect = [[cell for cell in cells if self.shooter.is_crossing(start, end, cell)]
+                          for cells in self.shooter.cells[::-1]]
+                self.assertEqual(crossed, [cells for cells in expect if cells])
+
+    @skipUnless(np, 'NumPy is not installed')
+    def test_cross(self):
+        """Test that _cross yields the cells intersecting a line by NumPy,
+           row by row from bottom to top.
+        """
+        self.run_test_of_cross()
+
+    def test_cross_without_numpy(self):
+        """Test that _cross yields the cells intersecting a line without NumPy,
+           row by row from bottom to top.
+        """
+        with mock.patch('pybubble_shooter.np', None):
+            self.run_test_of_cross()
+
+    def test_find_neighbors(self):
+        """Test that find_neighbors returns the cells around a cell from the lower row
+           to the upper, and the cells are kept as the neighbors of the cell.
         """
-        cells = [[self.get_cells(r, c, None) for c in range(COLS)] for r in range(ROWS)]
         tests = [
             (0, 0), (0, 5), (0, 16),
             (2, 0), (2, 5), (2, 16),
@@ -288,56 +360,50 @@ class FindDestinationTestCase(ShooterBasicTest):
             [(4, 6), (4, 5), (3, 6), (3, 4), (2, 6), (2, 5)],
             [(4, 16), (3, 15), (2, 16)]]
 
-        with mock.patch.object(self.shooter, 'cells', cells):
-            for test, expect in zip(tests, expects):
-                result = [(cell.row, cell.col) for cell in self.shooter.scan_bubbles(*test)]
-                self.assertEqual(len(result), len(expect))
-                self.assertEqual(result, expect)
+        for test, expect in zip(tests, expects):
+            with self.subTest(test):
+                self.assertEqual(self.shooter.find_neighbors(*test), expect)
+                neighbors = self.shooter.cells[test[0]][test[1]].neighbors
+                self.assertEqual([(cell.row, cell.col) for cell in neighbors], expect)
+                self.assertEqual(
+                    neighbors, tuple(self.shooter.cells[row][col] for row, col in expect))
 
     def test_scan(self):
         """Test _scan method.
         """
         cell_with_bubble = [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 1)]
-        cells = [[self.get_cells(r, c, object() if (r, c) in cell_with_bubble else None)
-                  for c in range(COLS)] for r in range(ROWS)]
-        target = cells[1][1]
+        self.set_bubbles(lambda r, c: (r, c) in cell_with_bubble)
+        target = self.shooter.cells[1][1]
 
-        with mock.patch.object(self.shooter, 'cells', cells):
-            result = [(cell.row, cell.col) for cell in self.shooter._scan(target)]
-            self.assertEqual(result, [(2, 2)])
+        result = [(cell.row, cell.col) for cell in self.shooter._scan(target)]
+        self.assertEqual(result, [(2, 2)])
 
     def test_helper_find_destination(self):
         """Test _find_destination method.
         """
-        cells = [[Cell(row=r, col=c) for c in range(COLS)] for r in range(ROWS)]
-
-        for r, c in [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2)]:
-            cells[r][c].bubble = object()
+        cells = self.shooter.cells
+        self.set_bubbles(lambda r, c: (r, c) in [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2)])
 
         target = cells[1][1]
         tests = (cells[3][2], cells[3][1], cells[3][0])
         expects = [(2, 2), (2, 2), (2, 1)]
 
-        with mock.patch.object(self.shooter, 'cells', cells):
-            for dest, expect in zip(tests, expects):
-                result = self.shooter._find_destination(target, dest)
-                self.assertEqual((result.row, result.col), expect)
+        for dest, expect in zip(tests, expects):
+            result = self.shooter._find_destination(target, dest)
+            self.assertEqual((result.row, result.col), expect)
 
     def test_helper_not_find_destination(self):
         """Test _find_destination method.
         """
-        cells = [[Cell(row=r, col=c) for c in range(COLS)] for r in range(ROWS)]
-
-        for r, c in [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 1), (2, 2)]:
-            cells[r][c].bubble = object()
+        cells = self.shooter.cells
+        self.set_bubbles(lambda r, c: (r, c) in [(0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 1), (2, 2)])
 
         target = cells[1][1]
         tests = (cells[3][2], cells[3][1], cells[3][0])
 
-        with mock.patch.object(self.shooter, 'cells', cells):
-            for dest in tests:
-                result = self.shooter._find_destination(target, dest)
-                self.assertEqual(result, None)
+        for dest in tests:
+            result = self.shooter._find_destination(target, dest)
+            self.assertEqual(result, None)
 
     def test_find_destination_traced_one_cell(self):
         """Test find_destination method when _trace yield one cell.
@@ -374,20 +440,15 @@ class FindDestinationTestCase(ShooterBasicTest):
                  for r, c, bubble in ((5, 3, None), (4, 2, None), (2, 0, object()))]
         start, end = Point(263, 600), Point(0, 400)
         mock_dest, mock_target = cells[-2:]
+        mock_dest.neighbors = [mock.MagicMock(bubble=None) for _ in range(6)]
 
         def _trace(start, end):
             for cell in cells:
                 yield cell
 
-        def scan_bubbles(row, col):
-            for _ in range(6):
-                yield mock.MagicMock(bubble=None)
-
         with mock.patch('pybubble_shooter.Shooter._trace') as mock_trace, \
-                mock.patch('pybubble_shooter.Shooter.scan_bubbles') as mock_scan_bubble, \
                 mock.patch('pybubble_shooter.Shooter._find_destination') as mock_helper_find_destination:
             mock_trace.return_value = _trace(start, end)
-            mock_scan_bubble.return_value = scan_bubbles(4, 2)
             mock_helper_find_destination.return_value = changed_dest
             dest, target = self.shooter.find_destination(start, end)
             self.assertEqual((dest, target), (changed_dest, mock_target))
@@ -400,23 +461,16 @@ class FindDestinationTestCase(ShooterBasicTest):
                  for r, c, bubble in ((5, 3, None), (4, 2, None), (2, 0, object()))]
         start, end = Point(263, 600), Point(0, 400)
         mock_dest, mock_target = cells[-2:]
+        mock_dest.neighbors = [
+            mock.MagicMock(bubble=mock.MagicMock() if i == 3 else None) for i in range(6)]
 
         def _trace(start, end):
             for cell in cells:
                 yield cell
 
-        def scan_bubbles(row, col):
-            for i in range(6):
-                if i == 3:
-                    yield mock.MagicMock(bubble=mock.MagicMock())
-                else:
-                    yield mock.MagicMock(bubble=None)
-
         with mock.patch('pybubble_shooter.Shooter._trace') as mock_trace, \
-                mock.patch('pybubble_shooter.Shooter.scan_bubbles') as mock_scan_bubble, \
                 mock.patch('pybubble_shooter.Shooter._find_destination') as mock_helper_find_destination:
             mock_trace.return_value = _trace(start, end)
-            mock_scan_bubble.return_value = scan_bubbles(4, 2)
             dest, target = self.shooter.find_destination(start, end)
             self.assertEqual((dest, target), (mock_dest, mock_target))
             mock_helper_find_destination.assert_not_called()
@@ -444,7 +498,7 @@ class ChangeBubblesTestCase(ShooterBasicTest):
         """Test delete_bubbles method.
         """
         mock_bubble = mock.MagicMock()
-        mock_bubble.kill.return_value = None
+        mock_bubble.release.return_value = None
         cells = [[Cell(r, c) for c in range(5)] for r in range(5)]
 
         for row in cells:
@@ -454,7 +508,7 @@ class ChangeBubblesTestCase(ShooterBasicTest):
         with mock.patch.object(self.shooter, 'cells', cells):
             self.shooter.delete_bubbles()
 
-        self.assertEqual(mock_bubble.kill.call_count, 25)
+        self.assertEqual(mock_bubble.release.call_count, 25)
         self.assertTrue(not any(cell.bubble for row in cells for cell in row))
 
     def test_increase_bubbles(self):
@@ -549,104 +603,197 @@ class SimulationMethodsTestCase(ShooterBasicTest):
                 result = self.shooter._simulate_course(*test['args'])
                 self.assertEqual(result, test['expect'])
 
+    def test_reflect(self):
+        """Test the points that reflect method returns.
+        """
+        tests = [
+            (90, [Point(263, 600), Point(263, 0)]),
+            (60, [Point(263, 600), Point(526, 144), Point(443, 0)]),
+            (120, [Point(263, 600), Point(0, 144), Point(83, 0)]),
+            (30, [Point(263, 600), Point(526, 448), Point(0, 144), Point(250, 0)]),
+            (150, [Point(263, 600), Point(0, 448), Point(526, 144), Point(276, 0)])
+        ]
+        for angle, expect in tests:
+            with self.subTest(angle):
+                self.assertEqual(self.shooter.reflect(angle), expect)
+
+    def test_reflect_bounces(self):
+        """Test that bounce points are on the side walls alternately and
+           in the straight line unfolded across the walls.
+        """
+        for angle in range(5, 176):
+            with self.subTest(angle):
+                points = self.shooter.reflect(angle)
+                self.assertEqual(points[0], self.shooter.launcher)
+                self.assertEqual(points[-1].y, 0)
+                walls = [pt.x for pt in points[1:-1]]
+                self.assertTrue(all(x in {0, 526} for x in walls))
+                self.assertTrue(all(x1 != x2 for x1, x2 in zip(walls, walls[1:])))
+                ys = [pt.y for pt in points]
+                self.assertEqual(ys, sorted(ys, reverse=True))
+                for pt1, pt2 in zip(points[1:-1], points[2:-1]):
+                    self.assertTrue(abs((pt1.y - pt2.y) - (ys[0] - ys[1]) * 526 / 263) <= 2)
+
     @mock.patch('pybubble_shooter.Shooter._simulate_course')
-    @mock.patch('pybubble_shooter.Shooter.calculate_bottom')
-    @mock.patch('pybubble_shooter.Shooter.calculate_height')
-    def test_simulate_bounce_course(self, mock_calc_height, mock_calc_bottom, mock_simulate_course):
-        """Test the number of lines that _simulate_bounce_course method recursively yields.
+    def test_simulate_shoot(self, mock_simulate_course):
+        """Test the lines that simulate_shoot method returns.
         """
+        points = [Point(263, 600), Point(526, 448), Point(0, 144), Point(250, 0)]
+        lines = [Line(pt1, pt2) for pt1, pt2 in zip(points, points[1:])]
         line = Line(Point(1, 1), Point(2, 2))
-        start = Point(0, 400)
-
+        self.shooter.bounces[90] = points
         tests = [
-            dict(args=(100, start, False, True), calc_height=[300], simu_course=[(True, line)], expect=[line]),
-            dict(args=(100, start, False, True), calc_height=[300], simu_course=[(True, None)], expect=[]),
-            dict(args=(100, start, False, True), calc_height=[800], simu_course=[(True, line)], expect=[line]),
-            dict(args=(100, start, False, True), calc_height=[800, 200], calc_bottom=[300], simu_course=[(False, line), (True, line)], expect=[line] * 2),
-            dict(args=(100, start, False, True), calc_height=[800, 600, 200], calc_bottom=[300, 150], simu_course=[(False, line), (False, line), (True, line)], expect=[line] * 3),
-            dict(args=(80, start, False, False), calc_height=[200], simu_course=[(False, line)], expect=[line]),
-            dict(args=(80, start, False, False), calc_height=[200], simu_course=[(True, None)], expect=[]),
-            dict(args=(80, start, False, False), calc_height=[600], calc_bottom=[300], simu_course=[(True, line)], expect=[line]),
-            dict(args=(80, start, False, False), calc_height=[600, 200], calc_bottom=[300], simu_course=[(False, line), (True, line)], expect=[line] * 2),
-            dict(args=(80, start, False, False), calc_height=[600, 700, 600, 200], calc_bottom=[300, 200, 200], simu_course=[(False, line), (False, line), (False, line), (True, line)], expect=[line] * 4),
+            dict(simu_course=[(True, line)], expect=[line], calls=1),
+            dict(simu_course=[(True, None)], expect=[], calls=1),
+            dict(simu_course=[(False, line), (True, line)], expect=[line] * 2, calls=2),
+            dict(simu_course=[(False, line), (False, line), (True, None)], expect=[line] * 2, calls=3),
+            dict(simu_course=[(False, line), (False, line), (True, line)], expect=[line] * 3, calls=3)
         ]
+        self.shooter.cells[19][0].bubble = mock.MagicMock(color='red')
 
         for test in tests:
             with self.subTest(test):
-                mock_calc_height.side_effect = test['calc_height']
+                mock_simulate_course.reset_mock()
                 mock_simulate_course.side_effect = test['simu_course']
-                if 'calc_bottom' in test:
-                    mock_calc_bottom.side_effect = test['calc_bottom']
-
-                result = [line for line in self.shooter._simulate_bounce_course(*test['args'])]
-                self.assertEqual(result, test['expect'])
+                self.assertEqual(self.shooter.simulate_shoot(), test['expect'])
+                self.assertEqual(mock_simulate_course.call_count, test['calls'])
+                for call, (pt1, pt2) in zip(mock_simulate_course.call_args_list, lines):
+                    self.assertEqual(call, mock.call(pt1, pt2, pt2 == points[-1]))
+
+    def test_bounces(self):
+        """Test that the bounce points are prepared for every launcher angle
+           move_left and move_right can set.
+        """
+        self.assertEqual(list(self.shooter.bounces), list(range(5, 176)))
+        for angle in (5, 30, 90, 150, 175):
+            with self.subTest(angle):
+                self.assertEqual(self.shooter.bounces[angle], self.shooter.reflect(angle))
 
-    def test_simulate_shoot_top(self):
-        """Test the number of lines that simulate_shoot_top method yields.
+    @mock.patch('pybubble_shooter.Shooter._simulate_course')
+    @mock.patch('pybubble_shooter.Shooter.reflect')
+    def test_simulate_shoot_table(self, mock_reflect, mock_simulate_course):
+        """Test that simulate_shoot reads the bounce points from the table,
+           and calls reflect only for the angles not in the table.
         """
-        start, end = Point(1, 1), Point(2, 2)
-        line = Line(Point(100, 100), Point(200, 200))
-        tests = [
-            [(True, line), [line]],
-            [(True, None), []],
-        ]
+        mock_simulate_course.return_value = (True, None)
+        mock_reflect.return_value = [Point(263, 600), Point(263, 0)]
+        tests = [(30, False), (175, False), (4, True), (30.5, True)]
 
-        with mock.patch('pybubble_shooter.Shooter._simulate_course') as mock_simulate_course:
-            for return_value, expect in tests:
-                with self.subTest():
-                    mock_simulate_course.return_value = return_value
-                    result = [line for line in self.shooter.simulate_shoot_top(start, end)]
-                    self.assertEqual(result, expect)
+        for angle, called in tests:
+            with self.subTest(angle):
+                mock_reflect.reset_mock()
+                with mock.patch.object(self.shooter, 'launcher_angle', angle):
+                    self.shooter.simulate_shoot()
+                    self.assertEqual(mock_reflect.called, called)
 
-    def test_simulate_shoot_left(self):
-        """Test the number of lines that simulate_shoot_left method yields.
+    @mock.patch('pybubble_shooter.Shooter._simulate_course')
+    def test_simulate_shoot_below_bubbles(self, mock_simulate_course):
+        """Test that simulate_shoot does not trace the lines below the lowest bubbles.
         """
-        start, end = Point(1, 1), Point(2, 2)
-        line = Line(Point(100, 100), Point(200, 200))
+        line = Line(Point(1, 1), Point(2, 2))
+        mock_simulate_course.return_value = (True, line)
+        self.set_bubbles(lambda r, c: r <= 3)
+        expect = [Line(Point(263, 600), Point(526, 448)), Line(Point(526, 448), Point(0, 144)), line]
 
-        def _simulate_bounce_course():
-            for _ in range(2):
-                yield line
+        with mock.patch.object(self.shooter, 'launcher_angle', 30):
+            result = self.shooter.simulate_shoot()
+            mock_simulate_course.assert_called_once_with(Point(0, 144), Point(250, 0), True)
+            self.assertEqual(result, expect)
 
+
+class DrawSettingTestCase(ShooterBasicTest):
+    """tests for the background drawn during play
+    """
+
+    def test_create_background(self):
+        """Test that the field, the panel, the bars, the labels and the launcher
+           are drawn on the background.
+        """
+        self.mock_sysfont.return_value.render.return_value = pygame.Surface((10, 10))
+        background = self.shooter.create_background()
         tests = [
-            [(True, line), [line]],
-            [(True, None), []],
-            [(False, line), [line] * 3],
+            ((0, 0), Colors.GREEN.color_code),          # field
+            ((520, 590), Colors.GREEN.color_code),
+            ((0, 649), Colors.DARK_GREEN.color_code),   # panel
+            ((107, 560), Colors.DARK_GREEN.color_code),  # bar
+            ((263, 590), Colors.DARK_GREEN.color_code),  # launcher
+            ((50, 541), (0, 0, 0))                      # label
         ]
+        self.assertEqual(background.get_size(), (526, 650))
+        for pos, color in tests:
+            with self.subTest(pos):
+                self.assertEqual(tuple(background.get_at(pos))[:3], color)
+        self.assertEqual(self.mock_sysfont.return_value.render.call_count, 5)
+
+    @mock.patch('pybubble_shooter.Shooter.create_background')
+    def test_get_background(self, mock_create_background):
+        """Test that the background is created only once.
+        """
+        for _ in range(3):
+            self.assertEqual(self.shooter.get_background(), mock_create_background.return_value)
 
-        with mock.patch('pybubble_shooter.Shooter._simulate_course') as mock_simulate_course, \
-                mock.patch('pybubble_shooter.Shooter._simulate_bounce_course') as mock_simulate_bounce_course:
-            for i, (return_value, expect) in enumerate(tests):
-                with self.subTest():
-                    mock_simulate_course.return_value = return_value
-                    mock_simulate_bounce_course.return_value = _simulate_bounce_course()
-                    result = [line for line in self.shooter.simulate_shoot_left(start, end)]
-                    self.assertEqual(result, expect)
+        mock_create_background.assert_called_once()
 
-    def test_simulate_shoot_right(self):
-        """Test the number of lines that simulate_shoot_right method yields.
-        """
-        start, end = Point(1, 1), Point(2, 2)
-        line = Line(Point(100, 100), Point(200, 200))
 
-        def _simulate_bounce_course():
-            for _ in range(2):
-                yield line
+class BoardTestCase(ShooterBasicTest):
+    """tests for the board on which the bubbles resting in the cells are drawn
+    """
 
-        tests = [
-            [(True, line), [line]],
-            [(True, None), []],
-            [(False, line), [line] * 3],
-        ]
+    def setUp(self):
+        super().setUp()
+        self.mock_sysfont.return_value.render.return_value = pygame.Surface((10, 10))
+        self.images = {}
+        for color, code in [('red', (255, 0, 0)), ('blue', (0, 0, 255))]:
+            self.images[color] = pygame.Surface((30, 30))
+            self.images[color].fill(code)
 
-        with mock.patch('pybubble_shooter.Shooter._simulate_course') as mock_simulate_course, \
-                mock.patch('pybubble_shooter.Shooter._simulate_bounce_course') as mock_simulate_bounce_course:
-            for i, (return_value, expect) in enumerate(tests):
-                with self.subTest():
-                    mock_simulate_course.return_value = return_value
-                    mock_simulate_bounce_course.return_value = _simulate_bounce_course()
-                    result = [line for line in self.shooter.simulate_shoot_right(start, end)]
-                    self.assertEqual(result, expect)
+    def get_bubble(self, color):
+        return mock.MagicMock(color=color, image=self.images[color])
+
+    def test_get_board(self):
+        """Test that the bubbles are drawn on the background only at the first time.
+        """
+        self.set_bubbles(lambda r, c: False)
+        self.shooter.cells[0][0].bubble = self.get_bubble('red')
+        board = self.shooter.get_board()
+
+        self.assertEqual(board.get_at(self.shooter.cells[0][0].center)[:3], (255, 0, 0))
+        self.assertEqual(board.get_at(self.shooter.cells[0][1].center)[:3], Colors.GREEN.color_code)
+        self.assertEqual(board.get_at((0, 649))[:3], Colors.DARK_GREEN.color_code)
+        self.assertEqual(self.shooter.stale, set())
+        self.assertIs(self.shooter.get_board(), board)
+
+    def test_refresh_board(self):
+        """Test that only the changed cells are drawn again.
+        """
+        self.set_bubbles(lambda r, c: False)
+        for col in range(2):
+            self.shooter.cells[0][col].bubble = self.get_bubble('red')
+        board = self.shooter.get_board()
+        cells = self.shooter.cells
+        cells[0][0].bubble = None
+        cells[1][1].bubble = self.get_bubble('blue')
+        cells[0][1].move_bubble(cells[2][1])
+
+        rects = self.shooter.refresh_board()
+        self.assertCountEqual(rects, [cells[r][c].rect for r, c in [(0, 0), (1, 1), (0, 1), (2, 1)]])
+        tests = [((0, 0), Colors.GREEN.color_code), ((1, 1), (0, 0, 255)), ((0, 1), Colors.GREEN.color_code)]
+        for (row, col), color in tests:
+            with self.subTest((row, col)):
+                self.assertEqual(board.get_at(cells[row][col].center)[:3], color)
+        self.assertEqual(self.shooter.refresh_board(), [])
+
+    def test_bubble_visible(self):
+        """Test that bubbles are not displayed as sprites while resting in the cells.
+        """
+        bubble = self.get_bubble('red')
+        cells = self.shooter.cells
+        cells[15][3].bubble = bubble
+        self.assertEqual(bubble.visible, 0)
+        cells[15][3].move_bubble(cells[16][3])
+        self.assertEqual(bubble.visible, 0)
+        cells[16][3].bubble = None
+        self.assertEqual(bubble.visible, 1)
 
 
 class UpdateMethodsTestCase(ShooterBasicTest):
@@ -654,157 +801,157 @@ class UpdateMethodsTestCase(ShooterBasicTest):
     """
     def setUp(self):
         super().setUp()
-        self.mock_draw_setting = mock.patch('pybubble_shooter.Shooter.draw_setting').start()
         self.mock_change_bubbles = mock.patch('pybubble_shooter.Shooter.change_bubbles').start()
         self.mock_increase_bubbles = mock.patch('pybubble_shooter.Shooter.increase_bubbles').start()
-        self.mock_calc_height = mock.patch('pybubble_shooter.Shooter.calculate_height').start()
-        self.mock_simulate_shoot_right = mock.patch('pybubble_shooter.Shooter.simulate_shoot_right').start()
-        self.mock_simulate_shoot_left = mock.patch('pybubble_shooter.Shooter.simulate_shoot_left').start()
-        self.mock_simulate_shoot_top = mock.patch('pybubble_shooter.Shooter.simulate_shoot_top').start()
-        self.mock_draw_line = mock.patch('pybubble_shooter.pygame.draw.line').start()
+        self.mock_simulate_shoot = mock.patch('pybubble_shooter.Shooter.simulate_shoot').start()
         self.mock_charge = mock.patch('pybubble_shooter.Shooter.charge').start()
 
     def test_quit_game_win(self):
-        """Test quit_game method when status is WIN.
+        """Test that quit_game method plays the fanfare and changes game status to WIN
+           one second after status is changed to WIN, without blocking.
         """
-        self.shooter.droppings_group.sprites.return_value = []
+        self.shooter.droppings.__len__.return_value = 0
 
         with mock.patch.object(self.shooter, 'status', Status.WIN), \
-                mock.patch('pybubble_shooter.Shooter.set_timer') as mock_set_timer:
+                mock.patch.object(self.shooter, 'game', Status.PLAY):
+            self.shooter.quit_game()
             self.shooter.quit_game()
-            self.check_called_once(mock_set_timer, self.shooter.fanfare.play)
+            self.assertEqual(len(self.shooter.scheduler.queue), 1)
+            self.shooter.scheduler.advance(999)
+            self.shooter.sounds.play.assert_not_called()
+            self.assertEqual(self.shooter.game, Status.PLAY)
+
+            self.shooter.scheduler.advance(1)
+            self.shooter.sounds.play.assert_called_once_with(SoundFiles.FANFARE)
             self.assertEqual(self.shooter.game, Status.WIN)
 
     def test_quit_game_gameover(self):
         """Test quit_game method when status is GAMEOVER.
         """
-        self.shooter.droppings_group.sprites.return_value = []
+        self.shooter.droppings.__len__.return_value = 0
 
-        with mock.patch.object(self.shooter, 'status', Status.GAMEOVER), \
-                mock.patch('pybubble_shooter.Shooter.set_timer') as mock_set_timer:
+        with mock.patch.object(self.shooter, 'status', Status.GAMEOVER):
             self.shooter.quit_game()
-            self.check_not_called(mock_set_timer, self.shooter.fanfare.play)
+            self.assertEqual(self.shooter.scheduler.queue, [])
+            self.shooter.sounds.play.assert_not_called()
             self.assertEqual(self.shooter.game, Status.GAMEOVER)
 
     def test_quit_game_dropping_group(self):
         """Test quit_game when dropping_group is not empty.
         """
-        self.shooter.droppings_group.sprites.return_value = [object()]
+        self.shooter.droppings.__len__.return_value = 1
 
         with mock.patch.object(self.shooter, 'status', Status.WIN), \
-                mock.patch.object(self.shooter, 'game', Status.PLAY), \
-                mock.patch('pybubble_shooter.Shooter.set_timer') as mock_set_timer:
+                mock.patch.object(self.shooter, 'game', Status.PLAY):
             self.shooter.quit_game()
-            self.check_not_called(mock_set_timer, self.shooter.fanfare.play)
+            self.shooter.scheduler.advance(1000)
+            self.shooter.sounds.play.assert_not_called()
+            self.assertEqual(self.shooter.is_quitting, False)
             self.assertEqual(self.shooter.game, Status.PLAY)
 
     def test_count_bubbles(self):
         """Test count_bubbles method.
         """
-        bubble = object()
-        cells = [[self.get_cells(r, c, bubble if r == 0 else None)
-                  for c in range(5)] for r in range(5)]
+        self.set_bubbles(lambda r, c: r == 0 and c < 5)
+        self.assertEqual(self.shooter.count_bubbles(), 5)
 
-        with mock.patch.object(self.shooter, 'cells', cells):
-            result = self.shooter.count_bubbles()
-            self.assertEqual(result, 5)
+        self.shooter.cells[0][0].bubble = None
+        self.shooter.cells[19][3].bubble = mock.MagicMock(color='blue')
+        self.assertEqual(self.shooter.count_bubbles(), 5)
+
+    def test_count_row_and_color(self):
+        """Test count_row and count_color methods.
+        """
+        self.set_bubbles(lambda r, c: r <= 1)
+        self.shooter.cells[1][5].bubble = mock.MagicMock(color='blue')
+        self.shooter.cells[0][3].move_bubble(self.shooter.cells[19][3])
+        tests = [
+            (self.shooter.count_row, 0, COLS - 1),
+            (self.shooter.count_row, 1, COLS),
+            (self.shooter.count_row, 19, 1),
+            (self.shooter.count_row, 5, 0),
+            (self.shooter.count_color, 'red', COLS * 2 - 1),
+            (self.shooter.count_color, 'blue', 1),
+            (self.shooter.count_color, 'pink', 0)
+        ]
+        for method, arg, expect in tests:
+            with self.subTest((method.__name__, arg)):
+                self.assertEqual(method(arg), expect)
 
     @mock.patch('pybubble_shooter.Shooter.quit_game')
     def test_update_win(self, mock_quit_game):
         """Test update method when shooter.status is changed to WIN and
            launcher is turned to the right.
         """
-        def simulate_shoot_right():
-            for _ in range(2):
-                yield Line(Point(1, 1), Point(2, 2))
-
         dest = self.get_cell()
-        cells = [[self.get_cells(r, c, None) for c in range(COLS)] for r in range(ROWS)]
-        self.mock_simulate_shoot_right.return_value = simulate_shoot_right()
-        self.mock_calc_height.return_value = 200
+        self.set_bubbles(lambda r, c: False)
+        self.mock_simulate_shoot.return_value = [Line(Point(1, 1), Point(2, 2))] * 2
 
         with mock.patch.object(self.shooter, 'launcher_angle', 30), \
-                mock.patch.object(self.shooter, 'cells', cells), \
                 mock.patch.object(self.shooter, 'dest', dest), \
                 mock.patch.object(self.shooter, 'game', Status.PLAY):
             self.shooter.update()
-            self.check_called_once(self.mock_draw_setting, mock_quit_game)
-            self.check_not_called(self.mock_charge, self.mock_simulate_shoot_left, self.mock_simulate_shoot_top)
+            mock_quit_game.assert_called_once()
+            self.mock_simulate_shoot.assert_called_once()
+            self.mock_charge.assert_not_called()
             self.assertEqual(self.shooter.status, Status.WIN)
-            self.assertEqual(self.mock_draw_line.call_count, 2)
+            self.assertEqual(self.shooter.course, self.mock_simulate_shoot.return_value)
 
     @mock.patch('pybubble_shooter.Shooter.quit_game')
     def test_update_gameover(self, mock_quit_game):
         """Test update when shooter.status is changed to GAMEOVER
            and launcher is turned to the left.
         """
-        def simulate_shoot_left():
-            for _ in range(2):
-                yield Line(Point(1, 1), Point(2, 2))
-
         dest = self.get_cell()
-        cells = [[self.get_cells(r, c, object()) for c in range(COLS)] for r in range(ROWS)]
-        self.mock_simulate_shoot_left.return_value = simulate_shoot_left()
-        self.mock_calc_height.return_value = 200
+        self.set_bubbles(lambda r, c: True)
+        self.mock_simulate_shoot.return_value = [Line(Point(1, 1), Point(2, 2))] * 2
 
         with mock.patch.object(self.shooter, 'launcher_angle', 150), \
-                mock.patch.object(self.shooter, 'cells', cells), \
                 mock.patch.object(self.shooter, 'dest', dest), \
                 mock.patch.object(self.shooter, 'game', Status.PLAY):
             self.shooter.update()
-            self.check_called_once(self.mock_draw_setting, mock_quit_game)
-            self.check_not_called(self.mock_simulate_shoot_right, self.mock_simulate_shoot_top, self.mock_charge)
+            mock_quit_game.assert_called_once()
+            self.mock_simulate_shoot.assert_called_once()
+            self.mock_charge.assert_not_called()
             self.assertEqual(self.shooter.status, Status.GAMEOVER)
-            self.assertEqual(self.mock_draw_line.call_count, 2)
+            self.assertEqual(self.shooter.course, self.mock_simulate_shoot.return_value)
 
     def test_update_less_than_10_bubbles(self):
         """Test update when the number of bubbles is less than 20 and
            launcher is turned to the top.
         """
-        def simulate_shoot_top():
-            yield Line(Point(1, 1), Point(2, 2))
-
         dest = self.get_cell()
-        cells = [[self.get_cells(r, c, object() if r == 0 and c < 10 else None)
-                  for c in range(COLS)] for r in range(ROWS)]
-        self.mock_simulate_shoot_top.return_value = simulate_shoot_top()
-        self.mock_calc_height.return_value = 200
+        self.set_bubbles(lambda r, c: r == 0 and c < 10)
+        self.mock_simulate_shoot.return_value = [Line(Point(1, 1), Point(2, 2))]
 
         with mock.patch.object(self.shooter, 'launcher_angle', 80), \
                 mock.patch.object(self.shooter.bullet, 'status', Status.STAY, create=True), \
-                mock.patch.object(self.shooter, 'cells', cells), \
                 mock.patch.object(self.shooter, 'dest', dest), \
                 mock.patch.object(self.shooter, 'is_decrease', True), \
                 mock.patch.object(self.shooter, 'game', Status.PLAY):
             self.shooter.update()
             self.assertEqual(self.shooter.status, Status.READY)
-            self.check_called_once(self.mock_draw_line, self.mock_change_bubbles)
+            self.mock_change_bubbles.assert_called_once()
             self.assertEqual(self.shooter.is_decrease, False)
-            self.check_not_called(self.mock_simulate_shoot_left, self.mock_simulate_shoot_right,
-                                  self.mock_charge, self.mock_increase_bubbles)
+            self.mock_simulate_shoot.assert_called_once()
+            self.check_not_called(self.mock_charge, self.mock_increase_bubbles)
 
     def test_update_more_than_20_bubbles(self):
         """Test update when the number of bubbles is more than 20 and
            is_increase is set to True and dest is None.
         """
-        def simulate_shoot_top():
-            yield Line(Point(1, 1), Point(2, 2))
-
-        cells = [[self.get_cells(r, c, object() if r <= 3 else None)
-                  for c in range(COLS)] for r in range(ROWS)]
-        self.mock_simulate_shoot_top.return_value = simulate_shoot_top()
-        self.mock_calc_height.return_value = 200
+        self.set_bubbles(lambda r, c: r <= 3)
+        self.mock_simulate_shoot.return_value = [Line(Point(1, 1), Point(2, 2))]
 
         with mock.patch.object(self.shooter, 'launcher_angle', 80), \
                 mock.patch.object(self.shooter.bullet, 'status', Status.STAY, create=True), \
-                mock.patch.object(self.shooter, 'cells', cells), \
                 mock.patch.object(self.shooter, 'is_increase', True), \
                 mock.patch.object(self.shooter, 'game', Status.PLAY):
             self.shooter.update()
             self.assertEqual(self.shooter.status, Status.READY)
             self.assertEqual(self.shooter.is_increase, False)
             self.mock_increase_bubbles.assert_called_once()
-            self.check_not_called(self.mock_draw_line, self.mock_charge, self.mock_change_bubbles)
+            self.check_not_called(self.mock_charge, self.mock_change_bubbles)
 
     def test_update_charge(self):
         """Test update method when status is CHARGE.
@@ -818,17 +965,93 @@ class UpdateMethodsTestCase(ShooterBasicTest):
     def test_update_bullet_status_shot(self):
         """Test update when bullet_status is SHOT.
         """
-        cells = [[self.get_cells(r, c, object() if r == 0 else None)
-                  for c in range(COLS)] for r in range(ROWS)]
+        self.set_bubbles(lambda r, c: r == 0)
 
         with mock.patch.object(self.shooter.bullet, 'status', Status.SHOT, create=True), \
-                mock.patch.object(self.shooter, 'cells', cells), \
                 mock.patch.object(self.shooter, 'is_increase', True), \
                 mock.patch.object(self.shooter, 'game', Status.PLAY):
             self.shooter.update()
             self.check_not_called(self.mock_charge, self.mock_change_bubbles, self.mock_increase_bubbles)
             self.assertEqual(self.shooter.is_increase, True)
 
+    def test_update_status_shot(self):
+        """Test that the course is not simulated again while a bullet is flying,
+           even if the launcher angle is changed.
+        """
+        course = [Line(Point(263, 600), Point(300, 100))]
+        dest = self.get_cell()
+
+        with mock.patch.object(self.shooter, 'game', Status.PLAY), \
+                mock.patch.object(self.shooter, 'status', Status.SHOT), \
+                mock.patch.object(self.shooter, 'course', course), \
+                mock.patch.object(self.shooter, 'dest', dest), \
+                mock.patch.object(self.shooter, 'launcher_angle', 30):
+            self.shooter.update()
+            self.mock_simulate_shoot.assert_not_called()
+            self.assertEqual(self.shooter.dest, dest)
+            self.assertEqual(self.shooter.course, course)
+
+
+class AimTestCase(ShooterBasicTest):
+    """tests for aim method
+    """
+
+    def test_revision(self):
+        """Test that revision is incremented only when the bubble of a cell is changed.
+        """
+        cell = self.shooter.cells[15][3]
+        bubble = mock.MagicMock(color='red')
+        tests = [(bubble, 1), (bubble, 1), (None, 2), (None, 2)]
+        revision = self.shooter.revision
+
+        for bubble, expect in tests:
+            with self.subTest(bubble):
+                cell.bubble = bubble
+                self.assertEqual(self.shooter.revision, revision + expect)
+
+    @mock.patch('pybubble_shooter.Shooter.simulate_shoot')
+    def test_aim_cached(self, mock_simulate_shoot):
+        """Test that the course is not simulated again if neither
+           the launcher angle nor the board is changed.
+        """
+        course = [Line(Point(1, 1), Point(2, 2))]
+        mock_simulate_shoot.return_value = course
+
+        for _ in range(3):
+            self.shooter.aim()
+        mock_simulate_shoot.assert_called_once()
+        self.assertEqual(self.shooter.course, course)
+
+    @mock.patch('pybubble_shooter.Shooter.simulate_shoot')
+    def test_aim_angle_changed(self, mock_simulate_shoot):
+        """Test that the course is simulated when the launcher angle is changed,
+           and the cached one is used when the angle is turned back.
+        """
+        courses = [[Line(Point(1, 1), Point(2, 2))], [Line(Point(3, 3), Point(4, 4))]]
+        mock_simulate_shoot.side_effect = courses
+
+        for angle, expect in [(90, courses[0]), (88, courses[1]), (90, courses[0])]:
+            with self.subTest(angle):
+                self.shooter.launcher_angle = angle
+                self.shooter.aim()
+                self.assertEqual(self.shooter.course, expect)
+        self.assertEqual(mock_simulate_shoot.call_count, 2)
+
+    @mock.patch('pybubble_shooter.Shooter.simulate_shoot')
+    def test_aim_board_changed(self, mock_simulate_shoot):
+        """Test that the course is simulated again when the board is changed,
+           and the courses simulated on the old board are discarded.
+        """
+        courses = [[Line(Point(1, 1), Point(2, 2))], [Line(Point(3, 3), Point(4, 4))]]
+        mock_simulate_shoot.side_effect = courses
+
+        self.shooter.aim()
+        self.shooter.cells[15][3].bubble = mock.MagicMock(color='red')
+        self.shooter.aim()
+        self.assertEqual(self.shooter.course, courses[1])
+        self.assertEqual(mock_simulate_shoot.call_count, 2)
+        self.assertEqual(len(self.shooter.courses), 1)
+
 
 class MethodsCalledByKeyEventTestCase(ShooterBasicTest):
     """tests for methods called by key event in main function
@@ -856,6 +1079,24 @@ class MethodsCalledByKeyEventTestCase(ShooterBasicTest):
                     self.shooter.move_right()
                     self.assertEqual(self.shooter.launcher_angle, expect)
 
+    def test_aim_at(self):
+        """Test that aim_at turns the launcher toward a point in steps of 0.1 degrees
+           and within 5 to 175 degrees.
+        """
+        tests = [
+            ((263, 0), 90),
+            ((526, 337), 45),
+            ((0, 337), 135),
+            ((300, 100), 85.8),
+            ((526, 599), 5),
+            ((0, 650), 175),
+            ((263, 650), 90)
+        ]
+        for pos, expect in tests:
+            with self.subTest(pos):
+                self.shooter.aim_at(*pos)
+                self.assertEqual(self.shooter.launcher_angle, expect)
+
     def test_shoot(self):
         """Test shoot method when shooter status is READY and
            dest is not None.